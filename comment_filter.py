@@ -5,6 +5,7 @@ Saves API requests by filtering out garbage comments.
 Also includes post flair filtering to skip Gain/Loss/YOLO posts.
 """
 import re
+from itertools import compress
 
 # Meme phrases that indicate low-value content
 MEME_PHRASES = [
@@ -48,6 +49,28 @@ VALUE_INDICATORS = [
     r'\b(bought|sold|position|shares?|entry|exit)\b',
 ]
 
+# All categories merged into one pattern compiled once at import, so each
+# comment is scanned a single time. Each match reports its category through
+# the named group; low-effort (anchored) wins first, then value beats meme
+# at the same offset. IGNORECASE replaces lowercasing every comment.
+_CATEGORY_RE = re.compile("|".join(
+    f"(?P<{name}>{'|'.join(f'(?:{p})' for p in patterns)})"
+    for name, patterns in (
+        ('low_effort', LOW_EFFORT_PATTERNS),
+        ('value', VALUE_INDICATORS),
+        ('meme', MEME_PHRASES),
+    )
+), re.IGNORECASE)
+
+# Post flairs that indicate low-value content (matched as substrings)
+SKIP_FLAIRS = ['gain', 'loss', 'gain/loss', 'gains', 'losses', 'meme']
+
+# Codepoints above 127000 (the emoji planes), counted by the C regex engine
+_EMOJI_RE = re.compile('[\U0001F019-\U0010FFFF]')
+
+# Single case-insensitive scan replacing one substring test per flair
+_SKIP_FLAIR_RE = re.compile("|".join(map(re.escape, SKIP_FLAIRS)), re.IGNORECASE)
+
 
 def is_quality_comment(text: str, min_length: int = 40) -> bool:
     """
@@ -60,34 +83,30 @@ def is_quality_comment(text: str, min_length: int = 40) -> bool:
     Returns:
         True if comment should be analyzed, False if it should be skipped
     """
-    if not text or len(text.strip()) < min_length:
+    # Cheap raw-length check first; stripping can only shorten the text
+    if not text or len(text) < min_length or len(text.strip()) < min_length:
         return False
     
-    text_lower = text.lower()
-    
-    # Skip pure emoji/low-effort
-    for pattern in LOW_EFFORT_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
+    meme_count = 0
+    for match in _CATEGORY_RE.finditer(text):
+        category = match.lastgroup
+        # Skip pure emoji/low-effort
+        if category == 'low_effort':
+            return False
+        # High-value indicators override meme detection
+        if category == 'value':
+            return True  # Has fundamentals/DD - keep it
+        # Count every meme occurrence, matching the per-word ratio below
+        meme_count += 1
+    
+    # If >30% of content is memes, skip it (only count words when needed)
+    if meme_count:
+        word_count = len(text.split())
+        if word_count > 0 and meme_count / word_count > 0.3:
             return False
-    
-    # Check for high-value indicators first (override meme detection)
-    has_value = any(re.search(pattern, text_lower, re.IGNORECASE) 
-                    for pattern in VALUE_INDICATORS)
-    
-    if has_value:
-        return True  # Has fundamentals/DD - keep it
-    
-    # Count meme phrases
-    meme_count = sum(1 for pattern in MEME_PHRASES 
-                     if re.search(pattern, text_lower, re.IGNORECASE))
-    
-    # If >30% of content is memes, skip it
-    word_count = len(text_lower.split())
-    if word_count > 0 and meme_count / word_count > 0.3:
-        return False
     
     # Check emoji ratio
-    emoji_count = sum(1 for c in text if ord(c) > 127000)  # Unicode emoji range
+    emoji_count = len(_EMOJI_RE.findall(text))  # Unicode emoji range
     char_count = len(text)
     if char_count > 0 and emoji_count / char_count > 0.2:  # >20% emojis
         return False
@@ -109,10 +128,7 @@ def should_skip_post_flair(flair: str) -> bool:
     if not flair:
         return False
     
-    SKIP_FLAIRS = ['gain', 'loss', 'gain/loss', 'gains', 'losses', 'meme']
-    flair_lower = flair.lower()
-    
-    return any(skip_flair in flair_lower for skip_flair in SKIP_FLAIRS)
+    return _SKIP_FLAIR_RE.search(flair) is not None
 
 
 def filter_comments(comments: list, min_length: int = 40, verbose: bool = False) -> tuple:
@@ -127,14 +143,12 @@ def filter_comments(comments: list, min_length: int = 40, verbose: bool = False)
     Returns:
         (filtered_comments, stats_dict)
     """
-    quality_comments = []
-    filtered_count = 0
-    
-    for comment in comments:
-        if is_quality_comment(comment.get('body', ''), min_length):
-            quality_comments.append(comment)
-        else:
-            filtered_count += 1
+    # Deliberately serial: the stdlib regex engine holds the GIL, so a thread
+    # pool would only add overhead for the ~50 comments filtered per subreddit.
+    verdicts = [is_quality_comment(comment.get('body', ''), min_length)
+                for comment in comments]
+    quality_comments = list(compress(comments, verdicts))
+    filtered_count = len(comments) - len(quality_comments)
     
     stats = {
         'total': len(comments),
@@ -1,5 +1,6 @@
 """Configuration settings for StockReddit."""
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,9 @@ REDDIT_CLIENT_ID = os.getenv('REDDIT_CLIENT_ID')
 REDDIT_CLIENT_SECRET = os.getenv('REDDIT_CLIENT_SECRET')
 REDDIT_USER_AGENT = os.getenv('REDDIT_USER_AGENT', 'StockReddit/1.0')
 
+# OpenRouter API key (LLM features only)
+OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
+
 # Top stock subreddits to monitor
 STOCK_SUBREDDITS = [
     'wallstreetbets',
@@ -23,14 +27,20 @@ STOCK_SUBREDDITS = [
     'SecurityAnalysis'
 ]
 
+# LLM scan early stop: give up on the remaining batches once the last
+# EARLY_STOP_WINDOW batches found fewer than EARLY_STOP_MIN_NOVEL new tickers
+EARLY_STOP_WINDOW = 3
+EARLY_STOP_MIN_NOVEL = int(os.getenv('EARLY_STOP_MIN_NOVEL', '2'))
+
 # Database settings
 DATABASE_PATH = 'stocks.db'
 
 # Stock ticker pattern (common US stock tickers: 1-5 uppercase letters)
 TICKER_PATTERN = r'\b[A-Z]{1,5}\b'
+TICKER_RE = re.compile(TICKER_PATTERN)
 
 # Common words to filter out (not stock tickers)
-COMMON_WORDS = {
+COMMON_WORDS = frozenset({
     'THE', 'AND', 'FOR', 'ARE', 'BUT', 'NOT', 'YOU', 'ALL', 'CAN', 'HER',
     'ONE', 'OUR', 'OUT', 'DAY', 'GET', 'HAS', 'HIM', 'HIS', 'HOW', 'WAS',
     'ITS', 'MAY', 'NEW', 'NOW', 'OLD', 'SEE', 'TWO', 'WAY', 'WHO', 'BOY',
@@ -41,5 +51,5 @@ COMMON_WORDS = {
     'WTF', 'FYI', 'ASAP', 'BTW',
     # Single-letter tickers that are commonly used as words
     'I', 'A'
-}
+})
 
@@ -1,46 +1,156 @@
-import { v } from "convex/values";
-import { mutation, query } from "./_generated/server";
+import { v, Infer } from "convex/values";
+import { mutation, query, MutationCtx } from "./_generated/server";
+
+const sentimentBreakdownValidator = v.object({
+  positive: v.number(),
+  neutral: v.number(),
+  negative: v.number(),
+});
+
+/**
+ * Fields accepted when storing an analysis
+ */
+const analysisFields = {
+  ticker: v.string(),
+  timeframe: v.string(),
+  totalMentions: v.number(),
+  subredditMentions: v.array(v.object({
+    subreddit: v.string(),
+    count: v.number(),
+  })),
+  averageSentiment: v.number(),
+  sentimentBreakdown: sentimentBreakdownValidator,
+  aiSummary: v.optional(v.string()),
+  aiContext: v.optional(v.string()),
+  rawPosts: v.optional(v.array(v.object({
+    postId: v.string(),
+    subreddit: v.string(),
+    title: v.string(),
+    text: v.string(),
+    score: v.number(),
+    sentiment: v.number(),
+    llmContext: v.optional(v.string()),
+  }))),
+};
+
+const analysisValidator = v.object(analysisFields);
+
+/**
+ * Compute weighted sentiment score: emphasize direction and confidence, scale by mention volume
+ * score = (pos - neg) / max(1,total) * log1p(totalMentions)
+ */
+function weightedSentimentScore(
+  breakdown: Infer<typeof sentimentBreakdownValidator>,
+  totalMentions: number
+) {
+  const total = breakdown.positive + breakdown.neutral + breakdown.negative;
+  const base = (breakdown.positive - breakdown.negative) / Math.max(1, total);
+  const weight = Math.log1p(totalMentions);
+  return base * weight;
+}
+
+/**
+ * Insert or patch a single analysis (shared by single and bulk upserts)
+ */
+async function upsertOne(ctx: MutationCtx, args: Infer<typeof analysisValidator>) {
+  const now = Date.now();
+  const sentimentScore = weightedSentimentScore(args.sentimentBreakdown, args.totalMentions);
+  
+  // Check if analysis exists
+  const existing = await ctx.db
+    .query("stockAnalyses")
+    .withIndex("by_ticker_timeframe", (q) => 
+      q.eq("ticker", args.ticker).eq("timeframe", args.timeframe)
+    )
+    .order("desc")
+    .first();
+  
+  if (existing) {
+    // Update existing analysis
+    await ctx.db.patch(existing._id, {
+      totalMentions: args.totalMentions,
+      subredditMentions: args.subredditMentions,
+      averageSentiment: args.averageSentiment,
+      sentimentBreakdown: args.sentimentBreakdown,
+      sentimentScore,
+      aiSummary: args.aiSummary,
+      aiContext: args.aiContext,
+      rawPosts: args.rawPosts,
+      lastUpdated: now,
+      analysisVersion: (existing.analysisVersion || 1) + 1,
+    });
+    
+    // Archive to history
+    await ctx.db.insert("stockHistory", {
+      ticker: args.ticker,
+      timeframe: args.timeframe,
+      mentions: args.totalMentions,
+      sentiment: args.averageSentiment,
+      timestamp: now,
+    });
+    
+    return { _id: existing._id, updated: true };
+  } else {
+    // Create new analysis
+    const id = await ctx.db.insert("stockAnalyses", {
+      ticker: args.ticker,
+      timeframe: args.timeframe,
+      totalMentions: args.totalMentions,
+      subredditMentions: args.subredditMentions,
+      averageSentiment: args.averageSentiment,
+      sentimentBreakdown: args.sentimentBreakdown,
+      sentimentScore,
+      aiSummary: args.aiSummary,
+      aiContext: args.aiContext,
+      rawPosts: args.rawPosts,
+      analyzedAt: now,
+      lastUpdated: now,
+      analysisVersion: 1,
+    });
+    
+    return { _id: id, updated: false };
+  }
+}
 
 /**
  * Store or update a stock analysis
  */
 export const upsertAnalysis = mutation({
+  args: analysisFields,
+  handler: async (ctx, args) => {
+    return await upsertOne(ctx, args);
+  },
+});
+
+/**
+ * Store or update many analyses in one transaction
+ */
+export const bulkUpsertAnalyses = mutation({
+  args: {
+    analyses: v.array(analysisValidator),
+  },
+  handler: async (ctx, args) => {
+    const results = [];
+    for (const analysis of args.analyses) {
+      results.push(await upsertOne(ctx, analysis));
+    }
+    return results;
+  },
+});
+
+/**
+ * Update only the sentiment statistics of an existing analysis.
+ * Leaves stored rawPosts untouched so re-evaluation doesn't re-upload them.
+ */
+export const updateSentimentStats = mutation({
   args: {
     ticker: v.string(),
     timeframe: v.string(),
-    totalMentions: v.number(),
-    subredditMentions: v.array(v.object({
-      subreddit: v.string(),
-      count: v.number(),
-    })),
     averageSentiment: v.number(),
-    sentimentBreakdown: v.object({
-      positive: v.number(),
-      neutral: v.number(),
-      negative: v.number(),
-    }),
+    sentimentBreakdown: sentimentBreakdownValidator,
     aiSummary: v.optional(v.string()),
-    aiContext: v.optional(v.string()),
-    rawPosts: v.optional(v.array(v.object({
-      postId: v.string(),
-      subreddit: v.string(),
-      title: v.string(),
-      text: v.string(),
-      score: v.number(),
-      sentiment: v.number(),
-      llmContext: v.optional(v.string()),
-    }))),
   },
   handler: async (ctx, args) => {
-    const now = Date.now();
-    const total = args.sentimentBreakdown.positive + args.sentimentBreakdown.neutral + args.sentimentBreakdown.negative;
-    // Compute weighted sentiment score: emphasize direction and confidence, scale by mention volume
-    // score = (pos - neg) / max(1,total) * log1p(totalMentions)
-    const base = (args.sentimentBreakdown.positive - args.sentimentBreakdown.negative) / Math.max(1, total);
-    const weight = Math.log1p(args.totalMentions);
-    const sentimentScore = base * weight;
-    
-    // Check if analysis exists
     const existing = await ctx.db
       .query("stockAnalyses")
       .withIndex("by_ticker_timeframe", (q) => 
@@ -49,51 +159,30 @@ export const upsertAnalysis = mutation({
       .order("desc")
       .first();
     
-    if (existing) {
-      // Update existing analysis
-      await ctx.db.patch(existing._id, {
-        totalMentions: args.totalMentions,
-        subredditMentions: args.subredditMentions,
-        averageSentiment: args.averageSentiment,
-        sentimentBreakdown: args.sentimentBreakdown,
-        sentimentScore,
-        aiSummary: args.aiSummary,
-        aiContext: args.aiContext,
-        rawPosts: args.rawPosts,
-        lastUpdated: now,
-        analysisVersion: (existing.analysisVersion || 1) + 1,
-      });
-      
-      // Archive to history
-      await ctx.db.insert("stockHistory", {
-        ticker: args.ticker,
-        timeframe: args.timeframe,
-        mentions: args.totalMentions,
-        sentiment: args.averageSentiment,
-        timestamp: now,
-      });
-      
-      return { _id: existing._id, updated: true };
-    } else {
-      // Create new analysis
-      const id = await ctx.db.insert("stockAnalyses", {
-        ticker: args.ticker,
-        timeframe: args.timeframe,
-        totalMentions: args.totalMentions,
-        subredditMentions: args.subredditMentions,
-        averageSentiment: args.averageSentiment,
-        sentimentBreakdown: args.sentimentBreakdown,
-        sentimentScore,
-        aiSummary: args.aiSummary,
-        aiContext: args.aiContext,
-        rawPosts: args.rawPosts,
-        analyzedAt: now,
-        lastUpdated: now,
-        analysisVersion: 1,
-      });
-      
-      return { _id: id, updated: false };
+    if (!existing) {
+      return null;
     }
+    
+    const now = Date.now();
+    await ctx.db.patch(existing._id, {
+      averageSentiment: args.averageSentiment,
+      sentimentBreakdown: args.sentimentBreakdown,
+      sentimentScore: weightedSentimentScore(args.sentimentBreakdown, existing.totalMentions),
+      aiSummary: args.aiSummary,
+      lastUpdated: now,
+      analysisVersion: (existing.analysisVersion || 1) + 1,
+    });
+    
+    // Archive to history
+    await ctx.db.insert("stockHistory", {
+      ticker: args.ticker,
+      timeframe: args.timeframe,
+      mentions: existing.totalMentions,
+      sentiment: args.averageSentiment,
+      timestamp: now,
+    });
+    
+    return { _id: existing._id, updated: true };
   },
 });
 
@@ -5,6 +5,7 @@ Provides a Python interface to store, retrieve, and manage stock analyses
 in Convex's real-time cloud database.
 """
 import os
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
 from convex import ConvexClient
 from dotenv import load_dotenv
@@ -29,6 +30,8 @@ class StockConvexClient:
                 "Get your URL by running: npx convex dev"
             )
         
+        # WebSocket client: mutation args are encoded natively by the Rust
+        # core, so there is no Python JSON serialization step on this path
         self.client = ConvexClient(self.url)
     
     def save_analysis(
@@ -60,6 +63,85 @@ class StockConvexClient:
         Returns:
             Dictionary with _id and updated status
         """
+        return self.client.mutation(
+            "stockAnalyses:upsertAnalysis",
+            self._analysis_args(
+                ticker, timeframe, total_mentions, subreddit_mentions,
+                average_sentiment, sentiment_breakdown,
+                ai_summary, ai_context, raw_posts
+            )
+        )
+    
+    def save_analyses_bulk(
+        self,
+        entries: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Save or update several stock analyses in a single mutation.
+        
+        Args:
+            entries: List of dicts with the same keyword arguments as save_analysis
+            
+        Returns:
+            List of {_id, updated} dictionaries, in the same order as entries
+        """
+        if not entries:
+            return []
+        return self.client.mutation(
+            "stockAnalyses:bulkUpsertAnalyses",
+            {"analyses": [self._analysis_args(**entry) for entry in entries]}
+        )
+    
+    def update_stats(
+        self,
+        ticker: str,
+        timeframe: str,
+        average_sentiment: float,
+        sentiment_breakdown: Dict[str, int],
+        ai_summary: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Update only the sentiment statistics of an existing analysis.
+        
+        Stored raw posts and mention data are left untouched, so they are
+        not sent back over the wire.
+        
+        Args:
+            ticker: Stock ticker symbol
+            timeframe: Analysis timeframe
+            average_sentiment: Average sentiment score
+            sentiment_breakdown: {positive, neutral, negative} counts
+            ai_summary: Optional AI-generated summary
+            
+        Returns:
+            Dictionary with _id and updated status, or None if not found
+        """
+        args = {
+            "ticker": ticker,
+            "timeframe": timeframe,
+            "averageSentiment": average_sentiment,
+            "sentimentBreakdown": sentiment_breakdown,
+        }
+        if ai_summary is not None:
+            args["aiSummary"] = ai_summary
+        return self.client.mutation(
+            "stockAnalyses:updateSentimentStats",
+            args
+        )
+    
+    @staticmethod
+    def _analysis_args(
+        ticker: str,
+        timeframe: str,
+        total_mentions: int,
+        subreddit_mentions: List[Dict[str, Any]],
+        average_sentiment: float,
+        sentiment_breakdown: Dict[str, int],
+        ai_summary: Optional[str] = None,
+        ai_context: Optional[str] = None,
+        raw_posts: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Build Convex mutation args for one analysis."""
         # Build args, only include optional fields if they're not None
         args = {
             "ticker": ticker,
@@ -77,10 +159,7 @@ class StockConvexClient:
         if raw_posts is not None:
             args["rawPosts"] = raw_posts
         
-        return self.client.mutation(
-            "stockAnalyses:upsertAnalysis",
-            args
-        )
+        return args
     
     def get_analysis(
         self,
@@ -265,6 +344,12 @@ class StockConvexClient:
             yield analysis
 
 
+@lru_cache(maxsize=1)
+def get_convex_client() -> StockConvexClient:
+    """Return a shared Convex client, created on first use."""
+    return StockConvexClient()
+
+
 def test_convex_connection():
     """Test Convex connection and display setup instructions if needed."""
     try:
@@ -5,15 +5,20 @@ Extends the stock tracking functionality to store results in Convex database
 for real-time access, historical tracking, and AI re-evaluation.
 """
 import argparse
-import os
+import heapq
 from collections import Counter
+from datetime import datetime
 from typing import List, Dict, Any
-from convex_client import StockConvexClient, test_convex_connection
+from config import OPENROUTER_API_KEY
+from convex_client import get_convex_client, test_convex_connection
 from stock_tracker_llm import track_hot_stocks_llm
 from sentiment_analyzer_llm import analyze_stock_sentiment_llm
-from llm_manager import MultiModelManager
+from llm_manager import MultiModelManager, get_model_manager
 from setup_checker import check_setup, prompt_openrouter_setup
 
+# Raw posts are only kept for re-evaluation summaries, so cap stored bodies
+RAW_POST_TEXT_LIMIT = 2000
+
 
 def save_tracking_results_to_convex(
     top_stocks: List[tuple],
@@ -30,23 +35,28 @@ def save_tracking_results_to_convex(
         subreddit_data: Dictionary of subreddit -> Counter(ticker: count)
         model_manager: Optional AI model manager for generating summaries
     """
-    client = StockConvexClient()
+    client = get_convex_client()
     
     print(f"\n{'='*60}")
     print("Saving Results to Convex Database")
     print(f"{'='*60}\n")
     
-    for ticker, total_count in top_stocks:
-        print(f"Saving {ticker}...")
-        
-        # Build subreddit mentions list
-        subreddit_mentions = []
-        for subreddit, counter in subreddit_data.items():
-            if ticker in counter:
-                subreddit_mentions.append({
+    # Build subreddit mentions for every top ticker in one pass over the counters
+    ticker_mentions: Dict[str, List[Dict[str, Any]]] = {
+        ticker: [] for ticker, _ in top_stocks
+    }
+    for subreddit, counter in subreddit_data.items():
+        for ticker, count in counter.items():
+            if ticker in ticker_mentions:
+                ticker_mentions[ticker].append({
                     "subreddit": subreddit,
-                    "count": counter[ticker]
+                    "count": count
                 })
+    
+    entries = []
+    for ticker, total_count in top_stocks:
+        print(f"Preparing {ticker}...")
+        subreddit_mentions = ticker_mentions[ticker]
         
         # Generate AI summary if model manager provided
         ai_summary = None
@@ -59,19 +69,22 @@ def save_tracking_results_to_convex(
             except Exception as e:
                 print(f"  ⚠ Could not generate AI summary: {e}")
         
-        # Save to Convex (sentiment data will be added by sentiment analyzer)
-        result = client.save_analysis(
-            ticker=ticker,
-            timeframe=timeframe,
-            total_mentions=total_count,
-            subreddit_mentions=subreddit_mentions,
-            average_sentiment=0.0,  # Placeholder, updated by sentiment analysis
-            sentiment_breakdown={"positive": 0, "neutral": 0, "negative": 0},
-            ai_summary=ai_summary
-        )
-        
+        # Sentiment data will be added by sentiment analyzer
+        entries.append({
+            "ticker": ticker,
+            "timeframe": timeframe,
+            "total_mentions": total_count,
+            "subreddit_mentions": subreddit_mentions,
+            "average_sentiment": 0.0,  # Placeholder, updated by sentiment analysis
+            "sentiment_breakdown": {"positive": 0, "neutral": 0, "negative": 0},
+            "ai_summary": ai_summary,
+        })
+    
+    # Save all tickers to Convex in one round-trip
+    results = client.save_analyses_bulk(entries)
+    for entry, result in zip(entries, results):
         status = "updated" if result.get("updated") else "created"
-        print(f"  ✓ {ticker} {status}")
+        print(f"  ✓ {entry['ticker']} {status}")
     
     print(f"\n✓ Saved {len(top_stocks)} stocks to Convex")
     print(f"{'='*60}\n")
@@ -89,35 +102,42 @@ def save_sentiment_to_convex(
     Args:
         ticker: Stock ticker symbol
         timeframe: Analysis timeframe
-        all_sentiments: List of sentiment dictionaries from analysis
+        all_sentiments: List of sentiment dictionaries from analysis, with
+            keys subreddit, post_id, sentiment, title, score and optional
+            text / llm_context
         total_mentions: Optional total mentions (from tracking)
     """
-    client = StockConvexClient()
+    client = get_convex_client()
     
     if not all_sentiments:
         print("⚠ No sentiment data to save")
         return
     
-    # Calculate sentiment statistics
-    sentiment_scores = [s['sentiment'] for s in all_sentiments]
-    avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
-    
-    positive_count = sum(1 for s in sentiment_scores if s > 0.05)
-    negative_count = sum(1 for s in sentiment_scores if s < -0.05)
-    neutral_count = len(sentiment_scores) - positive_count - negative_count
-    
-    # Build subreddit mentions
+    # Calculate sentiment statistics and subreddit counts in one pass
+    sentiment_total = 0.0
+    positive_count = 0
+    negative_count = 0
     subreddit_counter = Counter()
     for s in all_sentiments:
+        score = s['sentiment']
+        sentiment_total += score
+        if score > 0.05:
+            positive_count += 1
+        elif score < -0.05:
+            negative_count += 1
         subreddit_counter[s['subreddit']] += 1
     
+    avg_sentiment = sentiment_total / len(all_sentiments)
+    neutral_count = len(all_sentiments) - positive_count - negative_count
+    
+    # Build subreddit mentions
     subreddit_mentions = [
         {"subreddit": sub, "count": count}
         for sub, count in subreddit_counter.items()
     ]
     
     # Compile AI context from top posts
-    top_posts = sorted(all_sentiments, key=lambda x: x['score'], reverse=True)[:5]
+    top_posts = heapq.nlargest(5, all_sentiments, key=lambda x: x['score'])
     ai_context_parts = []
     for post in top_posts:
         if post.get('llm_context'):
@@ -131,7 +151,7 @@ def save_sentiment_to_convex(
             "postId": s['post_id'],
             "subreddit": s['subreddit'],
             "title": s['title'],
-            "text": s.get('text', ''),
+            "text": s.get('text', '')[:RAW_POST_TEXT_LIMIT],
             "score": s['score'],
             "sentiment": s['sentiment'],
             "llmContext": s.get('llm_context'),
@@ -170,7 +190,7 @@ def revaluate_stock(
         ticker: Stock ticker symbol to re-evaluate
         model_manager: AI model manager
     """
-    client = StockConvexClient()
+    client = get_convex_client()
     
     print(f"\n{'='*60}")
     print(f"Re-evaluating ${ticker} with AI")
@@ -191,7 +211,7 @@ def revaluate_stock(
         return
     
     if model_manager is None:
-        model_manager = MultiModelManager()
+        model_manager = get_model_manager()
     
     print(f"Found {len(raw_posts)} posts to re-analyze...")
     print(f"Current sentiment: {analysis['averageSentiment']:.3f}")
@@ -224,20 +244,17 @@ def revaluate_stock(
             [{"role": "user", "content": summary_prompt}]
         )
         
-        # Update in Convex
-        result = client.save_analysis(
+        # Update stats in Convex (raw posts stay server-side)
+        result = client.update_stats(
             ticker=ticker,
             timeframe=analysis['timeframe'],
-            total_mentions=analysis['totalMentions'],
-            subreddit_mentions=analysis['subredditMentions'],
             average_sentiment=avg_sentiment,
             sentiment_breakdown={
                 "positive": positive,
                 "neutral": neutral,
                 "negative": negative,
             },
-            ai_summary=ai_summary,
-            raw_posts=raw_posts
+            ai_summary=ai_summary
         )
         
         print(f"\n{'='*60}")
@@ -262,7 +279,7 @@ def list_convex_analyses(timeframe: str = None, limit: int = 20, sort_by: str =
         limit: Maximum number of results
         sort_by: Sort by 'sentiment' or 'mentions' (default: sentiment)
     """
-    client = StockConvexClient()
+    client = get_convex_client()
     
     analyses = client.list_analyses(timeframe=timeframe, limit=limit)
     
@@ -292,8 +309,7 @@ def list_convex_analyses(timeframe: str = None, limit: int = 20, sort_by: str =
         sentiment = analysis.get('sentimentScore', analysis['averageSentiment'])
         version = analysis.get('analysisVersion', 1)
         
-        import datetime
-        updated = datetime.datetime.fromtimestamp(
+        updated = datetime.fromtimestamp(
             analysis['lastUpdated'] / 1000
         ).strftime('%Y-%m-%d %H:%M')
         
@@ -306,7 +322,7 @@ def list_convex_analyses(timeframe: str = None, limit: int = 20, sort_by: str =
 
 def show_convex_analysis(ticker: str, timeframe: str = None) -> None:
     """Display detailed analysis for a ticker from Convex."""
-    client = StockConvexClient()
+    client = get_convex_client()
     
     analysis = client.get_analysis(ticker, timeframe)
     
@@ -314,8 +330,7 @@ def show_convex_analysis(ticker: str, timeframe: str = None) -> None:
         print(f"\n❌ No analysis found for ${ticker}")
         return
     
-    import datetime
-    updated = datetime.datetime.fromtimestamp(
+    updated = datetime.fromtimestamp(
         analysis['lastUpdated'] / 1000
     ).strftime('%Y-%m-%d %H:%M:%S')
     
@@ -403,11 +418,11 @@ def main():
             print(message)
             return
         
-        if not os.getenv('OPENROUTER_API_KEY'):
+        if not OPENROUTER_API_KEY:
             print(prompt_openrouter_setup())
             return
         
-        model_manager = MultiModelManager(max_requests_per_day=args.max_requests)
+        model_manager = get_model_manager(args.max_requests)
         revaluate_stock(args.ticker.upper(), model_manager)
 
 
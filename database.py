@@ -1,16 +1,132 @@
 """Database operations for storing stock mentions and sentiment data."""
 import sqlite3
-from datetime import datetime
-from typing import List, Tuple, Optional
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple, Optional
 from config import DATABASE_PATH
 
 
+# One long-lived connection per thread; all are tracked so close_all() can
+# shut them down. Bumping the generation makes threads reconnect afterwards.
+# A connection is also closed when its thread exits (worker pools come and
+# go), and whatever is still open is closed at interpreter exit.
+_local = threading.local()
+_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+
+# Short-lived cache for the aggregate read queries. Every write through this
+# module bumps the version and clears it; a result computed while a write
+# happened is not stored.
+RESULT_CACHE_TTL = 60  # seconds
+_result_cache: Dict[tuple, Tuple[float, Any]] = {}
+_cache_lock = threading.Lock()
+_write_version = 0
+
+
+# How long extracted LLM results stay reusable; older rows are pruned in init_database
+LLM_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+
+def _cached(key: tuple, compute: Callable[[], Any]) -> Any:
+    """Return a cached result for key, or compute and cache it."""
+    entry = _result_cache.get(key)
+    now = time.monotonic()
+    if entry is not None and now - entry[0] < RESULT_CACHE_TTL:
+        return entry[1]
+    
+    version = _write_version
+    value = compute()
+    with _cache_lock:
+        if version == _write_version:
+            _result_cache[key] = (now, value)
+    return value
+
+
+def _invalidate_cache():
+    """Drop cached read results after a write."""
+    global _write_version
+    with _cache_lock:
+        _write_version += 1
+        _result_cache.clear()
+
+
+def _today_bounds() -> Tuple[str, str]:
+    """Return (today, tomorrow) as UTC 'YYYY-MM-DD' strings, matching SQLite's date('now')."""
+    today = datetime.now(timezone.utc).date()
+    return today.isoformat(), (today + timedelta(days=1)).isoformat()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection with per-connection performance PRAGMAs applied."""
+    # Each connection is only used by its own thread; the check is disabled
+    # so close_all() may close it from whichever thread shuts down
+    # A larger statement cache keeps every query this module issues prepared
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, cached_statements=256)
+    # WAL (set in init_database) makes NORMAL safe: no fsync per commit
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-64000')  # ~64MB page cache
+    conn.execute('PRAGMA mmap_size=268435456')  # 256MB memory-mapped I/O
+    return conn
+
+
+class _ThreadConnection:
+    """A thread's connection; dropped with the thread's locals when it exits."""
+    
+    def __init__(self, conn: sqlite3.Connection, generation: int):
+        self.conn = conn
+        self.generation = generation
+
+
+def _release(conn: sqlite3.Connection):
+    """Stop tracking a connection and close it (no-op if already closed)."""
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    conn.close()
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Return this thread's shared connection, opening it on first use."""
+    holder = getattr(_local, 'holder', None)
+    if holder is None or holder.generation != _generation:
+        conn = _connect()
+        with _connections_lock:
+            _connections.append(conn)
+            holder = _ThreadConnection(conn, _generation)
+        # Runs when the thread exits (or the holder is replaced after
+        # close_all), and at interpreter exit for threads still alive
+        weakref.finalize(holder, _release, conn)
+        _local.holder = holder
+    return holder.conn
+
+
+def close_all():
+    """Close all shared connections (e.g. on shutdown)."""
+    global _generation
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+
+
 def init_database():
     """Initialize the SQLite database with required tables."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = _get_connection()
     cursor = conn.cursor()
     
-    # Table for stock mentions
+    # Write-ahead log: readers don't block the writer (persists in the file)
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
+    # Table for stock mentions. Kept as a plain rowid table with TEXT keys:
+    # reads go through daily_ticker_totals, so interning tickers/subreddits
+    # into id tables would only shrink a write-mostly log, at the cost of
+    # migrating existing database files.
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS stock_mentions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -46,8 +162,63 @@ def init_database():
         ON stock_sentiment(ticker)
     ''')
     
+    # Covering index for get_top_stocks (timeframe + day range, sum per ticker)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_mentions_tf_ts
+        ON stock_mentions(timeframe, timestamp, ticker, mention_count)
+    ''')
+    
+    # Range index for get_stock_sentiment (ticker + day range)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sentiment_ticker_ts
+        ON stock_sentiment(ticker, timestamp)
+    ''')
+    
+    # Pre-aggregated per-day totals, kept up to date by save_stock_mentions
+    cursor.execute('''
+        SELECT 1 FROM sqlite_master
+        WHERE type = 'table' AND name = 'daily_ticker_totals'
+    ''')
+    needs_backfill = cursor.fetchone() is None
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_ticker_totals (
+            ticker TEXT NOT NULL,
+            timeframe TEXT NOT NULL,
+            day TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (ticker, timeframe, day)
+        ) WITHOUT ROWID
+    ''')
+    
+    if needs_backfill:
+        # Seed from mentions recorded before the summary table existed
+        cursor.execute('''
+            INSERT INTO daily_ticker_totals (ticker, timeframe, day, total)
+            SELECT ticker, timeframe, date(timestamp), SUM(mention_count)
+            FROM stock_mentions
+            GROUP BY ticker, timeframe, date(timestamp)
+        ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_dtt_tf_day_total
+        ON daily_ticker_totals(timeframe, day, total DESC)
+    ''')
+    
+    # LLM extraction results keyed by a hash of the normalized input text
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            hash TEXT PRIMARY KEY,
+            result_json TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(
+        'DELETE FROM llm_cache WHERE created_at < ?',
+        (int(time.time()) - LLM_CACHE_TTL,)
+    )
+    
     conn.commit()
-    conn.close()
 
 
 def save_stock_mentions(mentions: List[Tuple[str, str, int, str]]):
@@ -57,34 +228,113 @@ def save_stock_mentions(mentions: List[Tuple[str, str, int, str]]):
     Args:
         mentions: List of tuples (ticker, subreddit, count, timeframe)
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    conn = _get_connection()
     
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = [
+        (ticker, subreddit, count, timeframe, timestamp)
+        for ticker, subreddit, count, timeframe in mentions
+    ]
     
-    for ticker, subreddit, count, timeframe in mentions:
-        cursor.execute('''
+    # INSERT OR REPLACE keeps one row per (ticker, subreddit, timeframe, second):
+    # the last one in the batch, replacing any row saved earlier that second.
+    # The daily totals get each key's final count minus the count it replaces.
+    final_counts = {}
+    for ticker, subreddit, count, timeframe, _ in rows:
+        final_counts[(ticker, subreddit, timeframe)] = count
+    
+    # One statement for the whole batch, committed as a single transaction
+    with conn:
+        # Take the write lock first, so the replaced counts read below can't
+        # change before the batch is written
+        conn.execute('BEGIN IMMEDIATE')
+        total_deltas = {}
+        for (ticker, subreddit, timeframe), count in final_counts.items():
+            replaced = conn.execute('''
+                SELECT mention_count FROM stock_mentions
+                WHERE ticker = ? AND subreddit = ? AND timeframe = ? AND timestamp = ?
+            ''', (ticker, subreddit, timeframe, timestamp)).fetchone()
+            if replaced is not None:
+                count -= replaced[0]
+            key = (ticker, timeframe)
+            total_deltas[key] = total_deltas.get(key, 0) + count
+        
+        conn.executemany('''
             INSERT OR REPLACE INTO stock_mentions 
             (ticker, subreddit, mention_count, timeframe, timestamp)
             VALUES (?, ?, ?, ?, ?)
-        ''', (ticker, subreddit, count, timeframe, timestamp))
-    
-    conn.commit()
-    conn.close()
+        ''', rows)
+        
+        # Keep the daily totals in step, in the same transaction
+        conn.executemany('''
+            INSERT INTO daily_ticker_totals (ticker, timeframe, day, total)
+            VALUES (?, ?, date(?), ?)
+            ON CONFLICT(ticker, timeframe, day)
+            DO UPDATE SET total = total + excluded.total
+        ''', [
+            (ticker, timeframe, timestamp, delta)
+            for (ticker, timeframe), delta in total_deltas.items()
+        ])
+    _invalidate_cache()
 
 
 def save_sentiment(ticker: str, subreddit: str, post_id: str, sentiment_score: float):
-    """Save sentiment analysis result to database."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    """Save a single sentiment analysis result (prefer save_sentiment_many for batches)."""
+    save_sentiment_many([(ticker, subreddit, post_id, sentiment_score)])
+
+
+def save_sentiment_many(rows: List[Tuple[str, str, str, float]]):
+    """
+    Save many sentiment analysis results in a single transaction.
     
-    cursor.execute('''
-        INSERT INTO stock_sentiment (ticker, subreddit, post_id, sentiment_score)
-        VALUES (?, ?, ?, ?)
-    ''', (ticker, subreddit, post_id, sentiment_score))
+    Args:
+        rows: List of tuples (ticker, subreddit, post_id, sentiment_score)
+    """
+    if not rows:
+        return
     
-    conn.commit()
-    conn.close()
+    conn = _get_connection()
+    
+    with conn:
+        conn.executemany('''
+            INSERT INTO stock_sentiment (ticker, subreddit, post_id, sentiment_score)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+    _invalidate_cache()
+
+
+def get_llm_cache(key: str) -> Optional[str]:
+    """
+    Look up a cached LLM result.
+    
+    Args:
+        key: Hash of the normalized input text
+        
+    Returns:
+        The stored JSON string, or None on a miss
+    """
+    conn = _get_connection()
+    try:
+        row = conn.execute(
+            'SELECT result_json FROM llm_cache WHERE hash = ? AND created_at >= ?',
+            (key, int(time.time()) - LLM_CACHE_TTL)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None  # Cache table not created (init_database not run)
+    return row[0] if row else None
+
+
+def save_llm_cache(key: str, result_json: str):
+    """Store an LLM result; cache failures never interrupt extraction."""
+    conn = _get_connection()
+    try:
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (hash, result_json, created_at) VALUES (?, ?, ?)',
+                (key, result_json, int(time.time()))
+            )
+    except sqlite3.OperationalError:
+        pass
 
 
 def get_top_stocks(timeframe: str, limit: int = 10) -> List[Tuple[str, int]]:
@@ -98,21 +348,26 @@ def get_top_stocks(timeframe: str, limit: int = 10) -> List[Tuple[str, int]]:
     Returns:
         List of tuples (ticker, total_mentions)
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    # Keyed by day so a cached result never outlives midnight
+    day, _ = _today_bounds()
+    results = _cached(
+        ('top_stocks', timeframe, limit, day),
+        lambda: _fetch_top_stocks(timeframe, limit, day)
+    )
+    return list(results)
+
+
+def _fetch_top_stocks(timeframe: str, limit: int, day: str) -> List[Tuple[str, int]]:
+    """Read a day's top tickers from the pre-aggregated totals (uncached)."""
+    conn = _get_connection()
     
-    cursor.execute('''
-        SELECT ticker, SUM(mention_count) as total_mentions
-        FROM stock_mentions
-        WHERE timeframe = ?
-        AND date(timestamp) = date('now')
-        GROUP BY ticker
-        ORDER BY total_mentions DESC
+    results = conn.execute('''
+        SELECT ticker, total
+        FROM daily_ticker_totals
+        WHERE timeframe = ? AND day = ?
+        ORDER BY total DESC
         LIMIT ?
-    ''', (timeframe, limit))
-    
-    results = cursor.fetchall()
-    conn.close()
+    ''', (timeframe, day, limit)).fetchall()
     
     return results
 
@@ -127,32 +382,44 @@ def get_stock_sentiment(ticker: str) -> Optional[dict]:
     Returns:
         Dictionary with sentiment statistics or None if no data found
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    day_start, day_end = _today_bounds()
+    result = _cached(
+        ('stock_sentiment', ticker, day_start),
+        lambda: _fetch_stock_sentiment(ticker, day_start, day_end)
+    )
+    return dict(result) if result is not None else None
+
+
+def _fetch_stock_sentiment(ticker: str, day_start: str, day_end: str) -> Optional[dict]:
+    """Run the sentiment statistics query for [day_start, day_end) (uncached)."""
+    conn = _get_connection()
     
-    cursor.execute('''
+    # One pass, one output row per bucket: 1 positive, -1 negative, 0 neutral
+    rows = conn.execute('''
         SELECT 
-            AVG(sentiment_score) as avg_sentiment,
-            COUNT(*) as total_posts,
-            SUM(CASE WHEN sentiment_score > 0.05 THEN 1 ELSE 0 END) as positive,
-            SUM(CASE WHEN sentiment_score < -0.05 THEN 1 ELSE 0 END) as negative,
-            SUM(CASE WHEN sentiment_score BETWEEN -0.05 AND 0.05 THEN 1 ELSE 0 END) as neutral
+            (sentiment_score > 0.05) - (sentiment_score < -0.05) as bucket,
+            COUNT(*),
+            SUM(sentiment_score)
         FROM stock_sentiment
         WHERE ticker = ?
-        AND date(timestamp) = date('now')
-    ''', (ticker,))
+        AND timestamp >= ? AND timestamp < ?
+        GROUP BY bucket
+    ''', (ticker, day_start, day_end)).fetchall()
     
-    result = cursor.fetchone()
-    conn.close()
+    counts = {1: 0, -1: 0, 0: 0}
+    score_sum = 0.0
+    for bucket, count, bucket_sum in rows:
+        counts[bucket] = count
+        score_sum += bucket_sum
     
-    if result[1] == 0:  # No data found
+    total_posts = counts[1] + counts[-1] + counts[0]
+    if total_posts == 0:  # No data found
         return None
     
     return {
-        'avg_sentiment': result[0],
-        'total_posts': result[1],
-        'positive': result[2],
-        'negative': result[3],
-        'neutral': result[4]
+        'avg_sentiment': score_sum / total_posts,
+        'total_posts': total_posts,
+        'positive': counts[1],
+        'negative': counts[-1],
+        'neutral': counts[0]
     }
-
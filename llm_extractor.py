@@ -2,18 +2,114 @@
 LLM-based stock ticker extraction using OpenRouter API.
 Provides context-aware extraction instead of regex pattern matching.
 """
-import os
 import json
+import logging
+import hashlib
+from functools import lru_cache
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Set, List, Dict, Optional, Any
-from dotenv import load_dotenv
+from config import OPENROUTER_API_KEY, TICKER_RE
+from database import get_llm_cache, save_llm_cache
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 OPENROUTER_API_URL = 'https://openrouter.ai/api/v1/chat/completions'
 
+# Shared keep-alive session: reuses TLS connections to OpenRouter across calls
+# and threads. Retries are handled by the callers' model-rotation loops.
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0))
+
+# Request headers are the same for every call; built once at import
+OPENROUTER_HEADERS = {
+    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
+    'Content-Type': 'application/json',
+}
+ATTRIBUTED_HEADERS = {
+    **OPENROUTER_HEADERS,
+    'HTTP-Referer': 'https://github.com/your-repo/StockReddit',
+    'X-Title': 'StockReddit Analysis'
+}
+
+# Concurrent requests used by batch_extract_tickers
+BATCH_WORKERS = 8
+
+
+@lru_cache(maxsize=4)
+def _sorted_sample(tickers: frozenset, n: int) -> str:
+    """Comma-joined first n tickers in sorted order (sorted once per ticker set)."""
+    return ', '.join(sorted(tickers)[:n])
+
+
+def ticker_sample(valid_tickers: Set[str], n: int) -> str:
+    """
+    Sample of valid tickers for prompt validation hints.
+    
+    The ticker universe is loaded once per run, so the sort is cached
+    instead of repeated on every LLM call.
+    
+    Args:
+        valid_tickers: Set of valid tickers
+        n: Number of tickers to include
+        
+    Returns:
+        Comma-separated ticker sample
+    """
+    return _sorted_sample(frozenset(valid_tickers), n)
+
+
+def extract_json(content: str) -> Any:
+    """
+    Parse the JSON object in an LLM reply.
+    
+    Slices from the first '{' to the last '}', which skips markdown code
+    fences and any prose around the object without re-splitting the text.
+    
+    Raises:
+        json.JSONDecodeError: If no valid JSON object is found
+    """
+    start = content.find('{')
+    end = content.rfind('}')
+    if start == -1 or end < start:
+        return json.loads(content)
+    return json.loads(content[start:end + 1])
+
+
+def encode_prompt(prompt: str) -> bytes:
+    """JSON-encode a prompt once per call; retries only re-render the small envelope."""
+    return json.dumps(prompt, ensure_ascii=False).encode('utf-8', 'replace')
+
+
+def request_body(model: str, encoded_prompt: bytes, max_tokens: int, temperature: float = 0.1) -> bytes:
+    """
+    Build a chat-completions request body around a pre-encoded prompt.
+    
+    Args:
+        model: OpenRouter model id
+        encoded_prompt: Output of encode_prompt()
+        max_tokens: Completion token limit
+        temperature: Sampling temperature
+        
+    Returns:
+        UTF-8 JSON body to send as request data
+    """
+    return b''.join((
+        b'{"model":', json.dumps(model).encode('utf-8'),
+        b',"messages":[{"role":"user","content":', encoded_prompt,
+        b'}],"max_tokens":', str(max_tokens).encode('ascii'),
+        b',"temperature":', repr(temperature).encode('ascii'),
+        b'}'
+    ))
+
+
+def text_cache_key(kind: str, text: str) -> str:
+    """Hash whitespace-normalized text into an llm_cache key for one extractor kind."""
+    normalized = ' '.join(text.split())
+    return hashlib.sha1(f"{kind}:{normalized}".encode('utf-8')).hexdigest()
+
 # Default model - DeepSeek V3.1 is FREE and excellent (671B params, 163K context)
 DEFAULT_MODEL = 'deepseek/deepseek-chat-v3.1:free'  # Free, high quality
 # 
@@ -32,7 +128,9 @@ DEFAULT_MODEL = 'deepseek/deepseek-chat-v3.1:free'  # Free, high quality
 def extract_tickers_batch(
     texts: List[str],
     model_manager: Any,
-    valid_tickers: Optional[Set[str]] = None
+    valid_tickers: Optional[Set[str]] = None,
+    max_chars: int = 500,
+    company_names: bool = False
 ) -> List[Dict]:
     """
     Analyze multiple texts in one API call.
@@ -42,6 +140,8 @@ def extract_tickers_batch(
         texts: List of texts to analyze
         model_manager: MultiModelManager instance
         valid_tickers: Optional set of valid tickers for validation
+        max_chars: Characters of each text sent to the model
+        company_names: Also map company names to tickers ("Apple" -> AAPL)
         
     Returns:
         List of dictionaries with 'tickers' and 'context' for each text
@@ -55,23 +155,43 @@ def extract_tickers_batch(
             "Please set OPENROUTER_API_KEY in .env file"
         )
     
+    # Only send texts with a standalone 1-5 letter uppercase run, i.e. that could
+    # hold a ticker (checked on the part the prompt uses); a company name
+    # needn't have one, so nothing is skipped when names count
+    keep_idx = [
+        i for i, text in enumerate(texts)
+        if company_names or TICKER_RE.search(text, 0, max_chars)
+    ]
+    if len(keep_idx) < len(texts):
+        results = [{'tickers': [], 'context': ''} for _ in texts]
+        if keep_idx:
+            kept_results = extract_tickers_batch(
+                [texts[i] for i in keep_idx], model_manager, valid_tickers, max_chars
+            )
+            for i, result in zip(keep_idx, kept_results):
+                results[i] = result
+        return results
+    
     # Build batch prompt
-    comments_text = "\n\n".join([
-        f"COMMENT {i+1}:\n{text[:500]}"  # Limit each to 500 chars
-        for i, text in enumerate(texts)
-    ])
+    comments_text = "\n\n".join(
+        f"COMMENT {i}:\n{text[:max_chars]}"
+        for i, text in enumerate(texts, 1)
+    )
+    
+    name_rule = ""
+    if company_names:
+        name_rule = '\n4. If someone says "Apple" or "Tesla", include the ticker (AAPL, TSLA)'
     
     validation_hint = ""
     if valid_tickers:
-        sample = sorted(list(valid_tickers))[:50]
-        validation_hint = f"\n\nValid US stock tickers include: {', '.join(sample)}..."
+        validation_hint = f"\n\nValid US stock tickers include: {ticker_sample(valid_tickers, 50)}..."
     
     prompt = f"""You are a financial text analyzer. Extract stock tickers from these {len(texts)} Reddit comments.
 
 IMPORTANT RULES:
 1. Only extract actual stock ticker symbols (e.g., AAPL, TSLA, GME)
 2. Ignore common words that aren't tickers (e.g., "I", "A", "FOR", "THE")
-3. Consider context - is the person discussing the stock or just using the word?{validation_hint}
+3. Consider context - is the person discussing the stock or just using the word?{name_rule}{validation_hint}
 
 {comments_text}
 
@@ -85,29 +205,23 @@ Return JSON array with results for each comment:
 
 JSON response:"""
 
+    encoded_prompt = encode_prompt(prompt)
+    
     # Retry with model rotation
     for attempt in range(3):
         model = model_manager.get_next_model()
         if not model:
-            print(f"⚠️  No models available (all rate limited or budget exhausted)")
+            logger.warning("No models available (all rate limited or budget exhausted)")
             return [{'tickers': [], 'budget_exhausted': True}] * len(texts)
         
         model_name = model.split('/')[-1]
-        print(f"  → Using {model_name} for batch of {len(texts)} comments...", end='', flush=True)
+        logger.debug("Using %s for batch of %d comments", model_name, len(texts))
         
         try:
-            response = requests.post(
+            response = HTTP_SESSION.post(
                 OPENROUTER_API_URL,
-                headers={
-                    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-                    'Content-Type': 'application/json',
-                },
-                json={
-                    'model': model,
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'max_tokens': 800,
-                    'temperature': 0.1
-                },
+                headers=OPENROUTER_HEADERS,
+                data=request_body(model, encoded_prompt, 800),
                 timeout=30
             )
             
@@ -124,7 +238,7 @@ JSON response:"""
             
             # Check for API errors
             if 'error' in result:
-                print(f"⚠️  API error: {result['error'].get('message', 'Unknown')[:60]}")
+                logger.warning("API error from %s: %.60s", model_name, result['error'].get('message', 'Unknown'))
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
@@ -132,7 +246,7 @@ JSON response:"""
             
             # Check for empty response
             if 'choices' not in result or not result['choices']:
-                print(f"⚠️  Empty response from {model_name}")
+                logger.warning("Empty response from %s", model_name)
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
@@ -141,18 +255,13 @@ JSON response:"""
             content = result['choices'][0]['message']['content'].strip()
             
             if not content:
-                print(f"⚠️  Empty content from {model_name}")
+                logger.warning("Empty content from %s", model_name)
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
                 return [{'tickers': [], 'context': {}}] * len(texts)
             
-            if '```json' in content:
-                content = content.split('```json')[1].split('```')[0].strip()
-            elif '```' in content:
-                content = content.split('```')[1].split('```')[0].strip()
-            
-            data = json.loads(content)
+            data = extract_json(content)
             results = data.get('results', [])
             
             # Validate tickers
@@ -167,25 +276,22 @@ JSON response:"""
             return results[:len(texts)]
             
         except json.JSONDecodeError as e:
-            print(f" JSON error: {str(e)[:40]}!", flush=True)
-            try:
-                print(f"   Response preview: {str(response.content[:150])}...")
-            except Exception:
-                pass
+            logger.warning("JSON parse error from %s: %s; response preview: %.150r",
+                           model_name, e, response.content)
             if attempt < 2:
                 time.sleep(1)
                 continue
         except requests.exceptions.Timeout:
-            print(f" timeout!", flush=True)
+            logger.warning("Timeout from %s", model_name)
             if attempt < 2:
                 continue
         except requests.exceptions.RequestException as e:
-            print(f" network error!", flush=True)
+            logger.warning("Network error from %s: %s", model_name, e)
             if attempt < 2:
                 time.sleep(1)
                 continue
         except Exception as e:
-            print(f" error: {str(e)[:50]}", flush=True)
+            logger.warning("Unexpected error from %s: %.100s", model_name, e)
             if attempt < 2:
                 time.sleep(1)
                 continue
@@ -193,6 +299,22 @@ JSON response:"""
     return [{'tickers': [], 'context': ''}] * len(texts)
 
 
+def _single_result(data: Dict, valid_tickers: Optional[Set[str]]) -> Dict[str, Any]:
+    """Shape a parsed single-text LLM answer, validating against known tickers if provided."""
+    if valid_tickers:
+        validated_tickers = [t for t in data.get('tickers', []) if t in valid_tickers]
+        validated_context = {k: v for k, v in data.get('context', {}).items() if k in valid_tickers}
+        return {
+            'tickers': validated_tickers,
+            'context': validated_context
+        }
+    
+    return {
+        'tickers': data.get('tickers', []),
+        'context': data.get('context', {})
+    }
+
+
 def extract_tickers_with_llm(
     text: str,
     model_manager: Any,
@@ -215,11 +337,16 @@ def extract_tickers_with_llm(
             "Please set OPENROUTER_API_KEY in .env file"
         )
     
+    # Duplicate texts (reposts, quotes) reuse an earlier answer
+    cache_key = text_cache_key('single', text[:1000])
+    cached = get_llm_cache(cache_key)
+    if cached is not None:
+        return _single_result(json.loads(cached), valid_tickers)
+    
     # Build validation hint if we have valid tickers
     validation_hint = ""
     if valid_tickers:
-        sample_tickers = sorted(list(valid_tickers))[:100]  # Show sample
-        validation_hint = f"\n\nValid US stock tickers include: {', '.join(sample_tickers[:50])}... (and {len(valid_tickers)} total)."
+        validation_hint = f"\n\nValid US stock tickers include: {ticker_sample(valid_tickers, 50)}... (and {len(valid_tickers)} total)."
     
     prompt = f"""You are a financial text analyzer. Extract ALL stock ticker symbols mentioned in the following Reddit post/comment.
 
@@ -247,46 +374,35 @@ If no tickers found, return: {{"tickers": [], "context": {{}}}}
 
 JSON response:"""
 
+    encoded_prompt = encode_prompt(prompt)
+    
     # Retry with model rotation
     for attempt in range(3):
         model = model_manager.get_next_model()
         if not model:
-            print(f"⚠️  No models available")
+            logger.warning("No models available")
             return {'tickers': [], 'context': {}, 'budget_exhausted': True}
         
         model_name = model.split('/')[-1]
-        print(f"  → {model_name}...", end='', flush=True)
+        logger.debug("Extracting with %s", model_name)
         
         try:
-            response = requests.post(
+            response = HTTP_SESSION.post(
                 OPENROUTER_API_URL,
-                headers={
-                    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-                    'Content-Type': 'application/json',
-                    'HTTP-Referer': 'https://github.com/your-repo/StockReddit',
-                    'X-Title': 'StockReddit Analysis'
-                },
-                json={
-                    'model': model,
-                    'messages': [
-                        {'role': 'user', 'content': prompt}
-                    ],
-                    'max_tokens': 500,
-                    'temperature': 0.1  # Low temperature for consistent extraction
-                },
+                headers=ATTRIBUTED_HEADERS,
+                data=request_body(model, encoded_prompt, 500),
                 timeout=10
             )
-            print(" ✓", flush=True)
             
             if response.status_code == 429:
-                print(f" rate limited!", flush=True)
+                logger.debug("%s rate limited", model_name)
                 model_manager.mark_rate_limited(model)
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                 continue
             
             if response.status_code != 200:
-                print(f"⚠️  HTTP {response.status_code} from {model.split('/')[-1]}")
+                logger.warning("HTTP %d from %s", response.status_code, model_name)
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
@@ -297,7 +413,7 @@ JSON response:"""
             
             # Check for API errors in response
             if 'error' in result:
-                print(f"⚠️  API error from {model.split('/')[-1]}: {result['error'].get('message', 'Unknown error')[:60]}")
+                logger.warning("API error from %s: %.60s", model_name, result['error'].get('message', 'Unknown error'))
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
@@ -305,7 +421,7 @@ JSON response:"""
             
             # Parse LLM response
             if 'choices' not in result or not result['choices']:
-                print(f"⚠️  Empty response from {model.split('/')[-1]}")
+                logger.warning("Empty response from %s", model_name)
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
@@ -314,57 +430,38 @@ JSON response:"""
             content = result['choices'][0]['message']['content'].strip()
             
             if not content:
-                print(f"⚠️  Empty content from {model.split('/')[-1]}")
+                logger.warning("Empty content from %s", model_name)
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
                 return {'tickers': [], 'context': {}}
             
-            # Extract JSON from response (handle markdown code blocks)
-            if '```json' in content:
-                content = content.split('```json')[1].split('```')[0].strip()
-            elif '```' in content:
-                content = content.split('```')[1].split('```')[0].strip()
+            # Extract JSON from response (handles markdown code blocks)
+            data = extract_json(content)
+            # Cache the unvalidated answer so any valid_tickers set can reuse it
+            save_llm_cache(cache_key, json.dumps(data))
             
-            data = json.loads(content)
-            
-            # Validate against known tickers if provided
-            if valid_tickers:
-                validated_tickers = [t for t in data.get('tickers', []) if t in valid_tickers]
-                validated_context = {k: v for k, v in data.get('context', {}).items() if k in valid_tickers}
-                return {
-                    'tickers': validated_tickers,
-                    'context': validated_context
-                }
-            
-            return {
-                'tickers': data.get('tickers', []),
-                'context': data.get('context', {})
-            }
+            return _single_result(data, valid_tickers)
             
         except json.JSONDecodeError as e:
-            # Log first 200 chars of response to debug
-            try:
-                content_preview = response.json() if hasattr(response, 'json') else str(response.content[:200])
-                print(f"⚠️  JSON parse error from {model.split('/')[-1]}: {str(e)[:60]}")
-                print(f"   Response preview: {str(content_preview)[:150]}...")
-            except Exception:
-                print(f"⚠️  JSON parse error from {model.split('/')[-1]}: {str(e)[:100]}")
+            # Include the start of the raw response to debug
+            logger.warning("JSON parse error from %s: %s; response preview: %.150r",
+                           model_name, e, response.content)
             if attempt < 2:
                 time.sleep(2 ** attempt)
                 continue
         except requests.exceptions.Timeout:
-            print(f"⚠️  Timeout from {model.split('/')[-1]}, retrying...")
+            logger.warning("Timeout from %s, retrying", model_name)
             if attempt < 2:
                 time.sleep(2 ** attempt)
                 continue
         except requests.exceptions.RequestException as e:
-            print(f"⚠️  Network error from {model.split('/')[-1]}: {str(e)[:100]}")
+            logger.warning("Network error from %s: %.100s", model_name, e)
             if attempt < 2:
                 time.sleep(2 ** attempt)
                 continue
         except Exception as e:
-            print(f"⚠️  Unexpected error: {str(e)[:100]}")
+            logger.warning("Unexpected error: %.100s", e)
             if attempt < 2:
                 time.sleep(2 ** attempt)
                 continue
@@ -374,26 +471,39 @@ JSON response:"""
 
 def batch_extract_tickers(
     texts: List[str],
-    model: str = DEFAULT_MODEL,
-    valid_tickers: Set[str] = None
-) -> List[Dict[str, any]]:
+    model_manager: Any,
+    valid_tickers: Optional[Set[str]] = None,
+    batch_size: int = 10,
+    max_chars: int = 500,
+    company_names: bool = False
+) -> List[Dict[str, Any]]:
     """
     Extract tickers from multiple texts.
     
+    Texts are grouped into chunks of batch_size and each chunk is sent as one
+    extract_tickers_batch request; chunks run concurrently over the shared session.
+    
     Args:
         texts: List of texts to analyze
-        model: OpenRouter model to use
+        model_manager: MultiModelManager instance
         valid_tickers: Optional set of valid tickers
+        batch_size: Texts per API request
+        max_chars: Characters of each text sent to the model
+        company_names: Also map company names to tickers ("Apple" -> AAPL)
         
     Returns:
-        List of extraction results
+        List of extraction results (same order as texts)
     """
-    results = []
-    for text in texts:
-        result = extract_tickers_with_llm(text, model, valid_tickers)
-        results.append(result)
+    chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
     
-    return results
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+        chunk_results = executor.map(
+            lambda chunk: extract_tickers_batch(
+                chunk, model_manager, valid_tickers, max_chars, company_names
+            ),
+            chunks
+        )
+        return [result for results in chunk_results for result in results]
 
 
 def get_available_models() -> List[str]:
@@ -2,17 +2,73 @@
 Aggregated LLM extraction - analyzes multiple posts at once.
 Uses batched input with concise aggregated output (up to ~2K output tokens).
 """
-import os
 import json
+import logging
 import time
 import requests
 from typing import List, Dict, Set, Optional, Any
-from dotenv import load_dotenv
+from config import OPENROUTER_API_KEY
+from database import get_llm_cache, save_llm_cache
+from post_filter import batch_posts_by_tokens, estimate_token_count
+from llm_extractor import (
+    HTTP_SESSION, OPENROUTER_HEADERS, encode_prompt, extract_json,
+    request_body, text_cache_key, ticker_sample
+)
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 OPENROUTER_API_URL = 'https://openrouter.ai/api/v1/chat/completions'
+# Requests go through live chat completions only: OpenRouter has no
+# file-based batch endpoint (and the rotated :free models carry no per-token
+# cost to discount), so there is no offline batch backend to switch to.
+
+# Oversized inputs are split into sub-batches that fit the context window
+MAX_PROMPT_TOKENS = 120_000
+PROMPT_OVERHEAD_TOKENS = 500
+
+# Reply budget for every request: reasoning models among the rotated ones
+# spend hundreds of tokens before the JSON starts, so it isn't scaled down
+MAX_OUTPUT_TOKENS = 2000
+
+
+def _aggregated_result(data: Dict, valid_tickers: Optional[Set[str]]) -> Dict:
+    """Shape a parsed aggregated LLM answer, dropping tickers not in valid_tickers."""
+    tickers_data = data.get('tickers', {})
+    
+    # Validate tickers
+    if valid_tickers:
+        tickers_data = {
+            ticker: info
+            for ticker, info in tickers_data.items()
+            if ticker in valid_tickers
+        }
+    
+    return {
+        'tickers': tickers_data,
+        'summary': data.get('summary', '')
+    }
+
+
+def _merge_aggregated(results: List[Dict]) -> Dict:
+    """Merge sub-batch results: sum mentions, mention-weighted average sentiment."""
+    merged = {}
+    for result in results:
+        for ticker, info in result['tickers'].items():
+            mentions = info.get('mentions', 0) or 0
+            sentiment = info.get('sentiment', 0) or 0
+            entry = merged.setdefault(ticker, {'mentions': 0, 'weighted': 0.0})
+            entry['mentions'] += mentions
+            entry['weighted'] += sentiment * mentions
+    
+    tickers_data = {
+        ticker: {
+            'mentions': entry['mentions'],
+            'sentiment': entry['weighted'] / entry['mentions'] if entry['mentions'] else 0.0
+        }
+        for ticker, entry in merged.items()
+    }
+    summary = ' '.join(result['summary'] for result in results if result.get('summary'))
+    return {'tickers': tickers_data, 'summary': summary}
 
 
 def extract_tickers_aggregated(
@@ -43,17 +99,32 @@ def extract_tickers_aggregated(
     if not OPENROUTER_API_KEY:
         raise ValueError("OpenRouter API key not found in .env file")
     
+    # Split inputs that would overflow the context into sub-batches, sent one
+    # after another so a call never has more than one request in flight
+    # (reddit_client_llm caps those process-wide with _llm_slots)
+    max_post_tokens = MAX_PROMPT_TOKENS - PROMPT_OVERHEAD_TOKENS
+    if len(posts) > 1:
+        token_counts = [estimate_token_count(p) for p in posts]
+        if sum(token_counts) > max_post_tokens:
+            sub_batches = batch_posts_by_tokens(posts, max_tokens=max_post_tokens, token_counts=token_counts)
+            return _merge_aggregated([
+                extract_tickers_aggregated(batch, model_manager, valid_tickers)
+                for batch in sub_batches
+            ])
+    
     # Build mega-batch with all posts
-    posts_text = "\n\n---POST SEPARATOR---\n\n".join([
-        f"{text}"  # Full text, no truncation
-        for text in posts
-    ])
+    posts_text = "\n\n---POST SEPARATOR---\n\n".join(posts)  # Full text, no truncation
+    
+    # Identical batches (re-runs over the same posts) reuse an earlier answer
+    cache_key = text_cache_key('aggregated', posts_text)
+    cached = get_llm_cache(cache_key)
+    if cached is not None:
+        return _aggregated_result(json.loads(cached), valid_tickers)
     
     # Keep prompt concise
     validation_hint = ""
     if valid_tickers:
-        sample = sorted(list(valid_tickers))[:30]
-        validation_hint = f"\nValid tickers: {', '.join(sample)}..."
+        validation_hint = f"\nValid tickers: {ticker_sample(valid_tickers, 30)}..."
     
     prompt = f"""Extract stock tickers and sentiment from {len(posts)} Reddit posts below.
 
@@ -73,6 +144,8 @@ OUTPUT (concise JSON only):
   }}
 }}"""
 
+    encoded_prompt = encode_prompt(prompt)
+    
     max_attempts = 5
     for attempt in range(max_attempts):
         try:
@@ -86,18 +159,10 @@ OUTPUT (concise JSON only):
             
             model_name = model.split('/')[-1]
             
-            response = requests.post(
+            response = HTTP_SESSION.post(
                 OPENROUTER_API_URL,
-                headers={
-                    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
-                    'Content-Type': 'application/json',
-                },
-                json={
-                    'model': model,
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'max_tokens': 2000,  # Concise output (~2K tokens)
-                    'temperature': 0.1
-                },
+                headers=OPENROUTER_HEADERS,
+                data=request_body(model, encoded_prompt, MAX_OUTPUT_TOKENS),
                 timeout=60  # Longer timeout for big batch
             )
             
@@ -112,7 +177,7 @@ OUTPUT (concise JSON only):
             result = response.json()
             
             if 'error' in result:
-                print(f"⚠️  API error: {result['error'].get('message', 'Unknown')[:60]}")
+                logger.warning("API error from %s: %.60s", model_name, result['error'].get('message', 'Unknown'))
                 if attempt < 2:
                     time.sleep(2 ** attempt)
                     continue
@@ -127,36 +192,21 @@ OUTPUT (concise JSON only):
             content = result['choices'][0]['message']['content'].strip()
             
             # Extract JSON
-            if '```json' in content:
-                content = content.split('```json')[1].split('```')[0].strip()
-            elif '```' in content:
-                content = content.split('```')[1].split('```')[0].strip()
-            
-            data = json.loads(content)
-            tickers_data = data.get('tickers', {})
-            
-            # Validate tickers
-            if valid_tickers:
-                tickers_data = {
-                    ticker: info
-                    for ticker, info in tickers_data.items()
-                    if ticker in valid_tickers
-                }
+            data = extract_json(content)
+            # Cache the unvalidated answer so any valid_tickers set can reuse it
+            save_llm_cache(cache_key, json.dumps(data))
             
-            return {
-                'tickers': tickers_data,
-                'summary': data.get('summary', '')
-            }
+            return _aggregated_result(data, valid_tickers)
             
         except json.JSONDecodeError as e:
             # Rotate to another model on parse errors
-            print(f"⚠️  JSON parse error on {model_name}; rotating model", flush=True)
+            logger.warning("JSON parse error on %s; rotating model", model_name)
             continue
         except requests.exceptions.Timeout:
-            print(f"⚠️  Request timeout", flush=True)
+            logger.warning("Request timeout")
             continue
         except Exception as e:
-            print(f"⚠️  Error: {str(e)[:40]}", flush=True)
+            logger.warning("Error: %.40s", e)
             if attempt < 2:
                 time.sleep(1)
                 continue
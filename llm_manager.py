@@ -2,15 +2,31 @@
 Multi-Model Manager for OpenRouter API.
 Handles round-robin model rotation, rate limiting, and request budget tracking.
 """
+import atexit
+import heapq
+import itertools
 import json
+import logging
+import os
+import tempfile
+import threading
 import time
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
 from typing import List, Optional, Dict
 
+logger = logging.getLogger(__name__)
+
 
 class MultiModelManager:
     """Manages multiple LLM models with round-robin rotation and rate limiting."""
     
+    # Budget writes are batched: flush after this many requests or seconds
+    FLUSH_EVERY = 25
+    FLUSH_INTERVAL = 5.0
+    # Longest get_next_model waits for a model to come off cooldown
+    MAX_WAIT = 1.0
+    
     def __init__(self, models: Optional[List[str]] = None, max_requests_per_day: int = 1000):
         """
         Initialize the multi-model manager.
@@ -49,26 +65,63 @@ class MultiModelManager:
             'meta-llama/llama-3.2-3b-instruct:free',
             'mistralai/mistral-nemo:free',
         ]
-        self.current_index = 0
-        self.rate_limited: Dict[str, float] = {}  # model -> timestamp when rate limit expires
+        # Short display names ('provider/model:tag' -> 'model:tag')
+        self._model_names = [model.rsplit('/', 1)[-1] for model in self.models]
+        # Min-heap of (ready_at, seq, model); _ready_at holds each model's current
+        # time so superseded heap entries can be skipped. seq keeps FIFO order
+        # among equally ready models, which gives the round-robin rotation.
+        self._ready_heap: List[tuple] = []
+        self._ready_at: Dict[str, float] = {}
+        self._seq = itertools.count()
+        # Reentrant: save_budget takes it too, and is called with it held
+        self._lock = threading.RLock()
+        for model in self.models:
+            self._schedule(model, 0.0)
+        # Pacing clock: monotonic, so wall-clock jumps can't break rate limiting
+        self._now = time.monotonic
+        self.rate_limited: Dict[str, float] = {}  # model -> monotonic time when rate limit expires
         # Per-model pacing to align with 20 req/min/model for :free variants
         self.requests_per_minute: float = 20.0
         self.min_interval: float = 60.0 / self.requests_per_minute  # ~3.0s
         self.last_request_time: Dict[str, float] = {}
+        # Token bucket per model: short bursts of up to burst requests, refilled
+        # at requests_per_minute so the average pace is unchanged
+        self.burst: float = 5.0
+        self._tokens: Dict[str, float] = {}
+        self._last_refill: Dict[str, float] = {}
         self.max_requests = max_requests_per_day
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+        self._today_day = 0
+        self._today_str = ''
+        self._next_midnight = 0.0
         self.budget = self.load_budget()
         # Ensure persisted limit aligns with constructor override
         if self.budget.get('limit') != self.max_requests:
             self.budget['limit'] = self.max_requests
             self.save_budget()
+        # Persist any unflushed request counts on interpreter exit
+        atexit.register(self.flush)
         
+    def _today(self) -> int:
+        """Today's day ordinal, recomputed (with its display string) only after midnight passes."""
+        if time.time() >= self._next_midnight:
+            today = date.today()
+            self._today_day = today.toordinal()
+            self._today_str = today.isoformat()
+            self._next_midnight = datetime.combine(today + timedelta(days=1), dt_time.min).timestamp()
+        return self._today_day
+    
     def load_budget(self) -> dict:
         """Load budget from file or create new if doesn't exist."""
         try:
             with open('request_budget.json', 'r') as f:
                 data = json.load(f)
+                day = data.get('day')
+                if day is None:  # Written before the integer day key existed
+                    day = date.fromisoformat(data['date']).toordinal()
                 # Reset if different day
-                if data['date'] != datetime.now().strftime('%Y-%m-%d'):
+                if day != self._today():
                     return self.reset_budget()
                 return data
         except (FileNotFoundError, json.JSONDecodeError):
@@ -77,7 +130,8 @@ class MultiModelManager:
     def reset_budget(self) -> dict:
         """Reset budget for a new day."""
         data = {
-            'date': datetime.now().strftime('%Y-%m-%d'),
+            'day': self._today(),
+            'date': self._today_str,  # Human-readable copy of 'day'
             'requests': {model: 0 for model in self.models},
             'total': 0,
             'limit': self.max_requests
@@ -100,57 +154,84 @@ class MultiModelManager:
     
     def save_budget(self, data: Optional[dict] = None):
         """Save budget to file."""
-        if data is None:
-            data = self.budget
-        with open('request_budget.json', 'w') as f:
-            json.dump(data, f, indent=2)
+        # The lock is held through the dump and the rename: counts can't change
+        # mid-dump, and concurrent flushes land one after another
+        with self._lock:
+            if data is None:
+                data = self.budget
+            # Write to a unique temp file and rename it over the original, so a
+            # crash mid-write can't leave a truncated budget file behind
+            fd, tmp_path = tempfile.mkstemp(dir='.', prefix='request_budget.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, separators=(',', ':'))
+                # mkstemp creates the file owner-only; keep the usual 0644
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, 'request_budget.json')
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._dirty_count = 0
+            self._last_flush = time.monotonic()
+    
+    def flush(self):
+        """Write pending request counts to file, if any."""
+        if self._dirty_count:
+            self.save_budget()
+    
+    def _schedule(self, model: str, ready_at: float):
+        """Set when a model may be used next (caller holds the lock or is __init__)."""
+        self._ready_at[model] = ready_at
+        heapq.heappush(self._ready_heap, (ready_at, next(self._seq), model))
+    
+    def _pop_ready(self, current_time: float):
+        """
+        Take the next ready model off the heap.
+        
+        Returns:
+            (model, None) if one is ready, else (None, seconds until the soonest
+            model is ready), or (None, None) if there are no models at all
+        """
+        with self._lock:
+            heap = self._ready_heap
+            while heap:
+                ready_at, _, model = heap[0]
+                if self._ready_at.get(model) != ready_at:
+                    heapq.heappop(heap)  # Superseded entry
+                    continue
+                if ready_at > current_time:
+                    return None, ready_at - current_time
+                # Rotate to the back; increment_request/mark_rate_limited push it further out
+                heapq.heappop(heap)
+                self._schedule(model, current_time)
+                return model, None
+        return None, None
     
     def get_next_model(self) -> Optional[str]:
         """
         Get next available model in round-robin fashion.
         
+        If no model is ready, waits until the soonest one is (up to
+        MAX_WAIT seconds) instead of returning straight away.
+        
         Returns:
             Model identifier or None if all models are rate limited
         """
-        current_time = time.time()
-        checked = 0
-        chosen = None
-        next_available_in = None
-        total = len(self.models)
-        
-        while checked < total:
-            model = self.models[self.current_index]
-            self.current_index = (self.current_index + 1) % total
-            checked += 1
+        deadline = None
+        while True:
+            current_time = self._now()
+            model, wait = self._pop_ready(current_time)
+            if model is not None or wait is None:
+                return model
             
-            # Hard rate limit backoff window
-            if model in self.rate_limited:
-                if current_time < self.rate_limited[model]:
-                    remaining = self.rate_limited[model] - current_time
-                    next_available_in = min(next_available_in, remaining) if next_available_in is not None else remaining
-                    continue
-                else:
-                    del self.rate_limited[model]
-            
-            # Soft per-model pacing (20 req/min)
-            last_ts = self.last_request_time.get(model, 0.0)
-            delta = current_time - last_ts
-            if delta < self.min_interval:
-                remaining = self.min_interval - delta
-                next_available_in = min(next_available_in, remaining) if next_available_in is not None else remaining
-                continue
-            
-            chosen = model
-            break
-        
-        if chosen is None:
-            # No model ready yet; brief wait based on soonest availability
-            if next_available_in is not None and next_available_in > 0:
-                sleep_s = min(max(next_available_in, 0.05), 1.0)
-                time.sleep(sleep_s)
-            return None
-        
-        return chosen
+            if deadline is None:
+                deadline = current_time + self.MAX_WAIT
+            remaining = deadline - current_time
+            if remaining <= 0:
+                return None
+            # Sleep exactly until the soonest model is ready (no polling floor)
+            time.sleep(min(wait, remaining))
     
     def mark_rate_limited(self, model: str, duration: int = None):
         """
@@ -163,28 +244,60 @@ class MultiModelManager:
         # Default cooldown derived from 20 req/min cadence
         if duration is None:
             duration = max(1, int(self.min_interval))
-        self.rate_limited[model] = time.time() + duration
-        print(f"⚠️  Rate limited on {model.split('/')[-1]}, cooling down ~{duration}s")
+        self.rate_limited[model] = self._now() + duration
+        with self._lock:
+            self._schedule(model, self.rate_limited[model])
+        logger.warning("⚠️  Rate limited on %s, cooling down ~%ss", model.rsplit('/', 1)[-1], duration)
     
     def increment_request(self, model: str):
         """
-        Track a successful request and persist to file.
+        Track a successful request; counts are persisted in batches.
         
         Args:
             model: Model identifier that handled the request
         """
-        self.budget['requests'][model] = self.budget['requests'].get(model, 0) + 1
-        self.budget['total'] += 1
-        self.last_request_time[model] = time.time()
+        now = self._now()
+        self.last_request_time[model] = now
+        # Requests can complete on several threads at once
+        with self._lock:
+            self.budget['requests'][model] = self.budget['requests'].get(model, 0) + 1
+            self.budget['total'] += 1
+            
+            # Soft per-model pacing (token bucket), never shortening a rate-limit cooldown
+            rate = self.requests_per_minute / 60.0
+            tokens = self._tokens.get(model, self.burst)
+            elapsed = now - self._last_refill.get(model, now)
+            tokens = min(self.burst, tokens + elapsed * rate) - 1.0
+            self._tokens[model] = tokens
+            self._last_refill[model] = now
+            
+            ready_at = now if tokens >= 1.0 else now + (1.0 - tokens) / rate
+            self._schedule(model, max(ready_at, self._ready_at.get(model, 0.0)))
+            
+            total = self.budget['total']
+            self._dirty_count += 1
+            if (self._dirty_count >= self.FLUSH_EVERY
+                    or time.monotonic() - self._last_flush > self.FLUSH_INTERVAL):
+                # Flushed under the lock, so only one thread writes each batch
+                # and the snapshot can't change while it is dumped
+                pending = self._dirty_count
+                self._dirty_count = 0
+                self._last_flush = time.monotonic()
+                snapshot = dict(self.budget, requests=dict(self.budget['requests']))
+                try:
+                    self.save_budget(snapshot)
+                except Exception as e:
+                    # The request itself succeeded and is counted: a failed write
+                    # must not reach the caller's retry loop and spend budget again
+                    self._dirty_count = pending  # Still pending; flush() retries at exit
+                    logger.warning("⚠️  Could not save request budget: %s", e)
         
         # Warn at thresholds
-        percentage = (self.budget['total'] / self.max_requests) * 100
-        if percentage >= 90 and self.budget['total'] % 10 == 0:
-            print(f"🚨 Budget critical: {percentage:.0f}% used ({self.budget['total']}/{self.max_requests})")
-        elif percentage >= 80 and self.budget['total'] % 50 == 0:
-            print(f"⚠️  Budget warning: {percentage:.0f}% used ({self.budget['total']}/{self.max_requests})")
-        
-        self.save_budget()
+        percentage = (total / self.max_requests) * 100
+        if percentage >= 90 and total % 10 == 0:
+            logger.warning("🚨 Budget critical: %.0f%% used (%d/%d)", percentage, total, self.max_requests)
+        elif percentage >= 80 and total % 50 == 0:
+            logger.warning("⚠️  Budget warning: %.0f%% used (%d/%d)", percentage, total, self.max_requests)
     
     def check_budget(self) -> int:
         """
@@ -214,10 +327,35 @@ class MultiModelManager:
         Returns:
             Formatted string with per-model stats
         """
-        stats = [f"Total: {self.get_stats()}"]
-        for model in self.models:
-            count = self.budget['requests'].get(model, 0)
-            model_name = model.split('/')[-1]
-            stats.append(f"  {model_name}: {count} requests")
-        return "\n".join(stats)
+        requests = self.budget['requests']
+        lines = [f"Total: {self.get_stats()}"]
+        lines.extend(
+            f"  {model_name}: {requests.get(model, 0)} requests"
+            for model, model_name in zip(self.models, self._model_names)
+        )
+        return "\n".join(lines)
+
+
+# Shared managers by daily limit, so every caller in the process rotates
+# models and counts budget through one instance
+_shared_managers: Dict[int, MultiModelManager] = {}
+_shared_managers_lock = threading.Lock()
 
+
+def get_model_manager(max_requests_per_day: int = 1000) -> MultiModelManager:
+    """
+    Return the shared model manager for a daily limit, creating it on first use.
+    
+    Args:
+        max_requests_per_day: Maximum requests allowed per day
+        
+    Returns:
+        The process-wide MultiModelManager for that limit
+    """
+    with _shared_managers_lock:
+        manager = _shared_managers.get(max_requests_per_day)
+        if manager is None:
+            manager = _shared_managers[max_requests_per_day] = MultiModelManager(
+                max_requests_per_day=max_requests_per_day
+            )
+        return manager
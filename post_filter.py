@@ -3,51 +3,61 @@ Pre-filter posts before LLM analysis to save API requests.
 Only process posts likely to contain tickers with good engagement.
 """
 import re
+from bisect import bisect_right
+from itertools import accumulate
+from config import TICKER_RE
 
-def likely_has_ticker(text: str) -> bool:
+# Precompiled $-ticker pattern for likely_has_ticker (caps runs use
+# config.TICKER_RE). The scan itself runs in re's C engine and stops at the
+# first plausible ticker, so a compiled extension would add a build step for
+# little gain.
+_DOLLAR_TICKER_RE = re.compile(r'\$[A-Z]{1,5}\b')
+
+# Short all-caps words that are not tickers. Plain str keys: str hashes are
+# cached on the object, so lookups of regex-matched tokens are already cheap.
+_COMMON_WORDS = frozenset({
+    'I', 'A', 'IT', 'IS', 'OR', 'SO', 'DO', 'GO', 'TO', 'BE', 'WE', 'HE', 'ME',
+    'US', 'UP', 'AT', 'BY', 'IN', 'ON', 'NO', 'MY', 'AM', 'AN', 'AS', 'IF',
+    'THE', 'AND', 'FOR', 'NOT', 'BUT', 'CAN', 'ALL', 'ARE', 'WAS', 'HAS',
+    'HIS', 'HER', 'ITS', 'OUR', 'OUT', 'NEW', 'NOW', 'OLD', 'ONE', 'TWO',
+    'WHY', 'HOW', 'WHO', 'MAY', 'WAY', 'DAY', 'GET', 'GOT', 'HAD',
+    'WILL', 'YEAR', 'WEEK', 'TIME', 'JUST', 'LIKE', 'MAKE', 'TAKE', 'LOOK',
+    'KNOW', 'THINK', 'WANT', 'NEED', 'GOOD', 'MUCH', 'MORE', 'VERY', 'WELL',
+    'ALSO', 'BACK', 'DOWN', 'EVEN', 'BEEN', 'FROM', 'HERE', 'ONLY', 'OVER',
+    'THAN', 'THEN', 'THEM', 'THEY', 'THIS', 'THAT', 'WHAT', 'WHEN', 'WITH',
+    'YOUR', 'HAVE', 'INTO', 'SOME', 'SAID', 'EACH', 'COME', 'MADE', 'MOST',
+    'LONG', 'DOES', 'SUCH', 'BOTH', 'MANY', 'MUST', 'CALL', 'NEXT', 'EVER',
+    'ONCE', 'DD', 'TA', 'FD', 'ATH', 'ATL', 'IPO', 'ETF', 'CEO', 'CFO',
+    'WSB', 'IMO', 'TBH', 'LOL', 'WTF', 'FYI', 'ASAP', 'FOMO', 'YOLO'
+})
+
+
+def likely_has_ticker(text: str, min_length: int = 10) -> bool:
     """
     Quick check if text likely contains stock tickers.
     Much faster than LLM, filters out irrelevant posts.
     
     Args:
         text: Post title + body text
+        min_length: Shorter texts are rejected outright
     
     Returns:
         True if text likely contains tickers
     """
-    if not text or len(text) < 10:
+    if not text or len(text) < min_length:
         return False
     
     # Check for $ symbols (common ticker notation)
-    if '$' in text and re.search(r'\$[A-Z]{1,5}\b', text):
+    if '$' in text and _DOLLAR_TICKER_RE.search(text):
         return True
     
-    # Check for all-caps words 1-5 letters (likely tickers)
-    # But avoid common words
-    COMMON_WORDS = {
-        'I', 'A', 'IT', 'IS', 'OR', 'SO', 'DO', 'GO', 'TO', 'BE', 'WE', 'HE', 'ME',
-        'US', 'UP', 'AT', 'BY', 'IN', 'ON', 'NO', 'MY', 'AM', 'AN', 'AS', 'IF',
-        'THE', 'AND', 'FOR', 'NOT', 'BUT', 'CAN', 'ALL', 'ARE', 'WAS', 'HAS',
-        'HIS', 'HER', 'ITS', 'OUR', 'OUT', 'NEW', 'NOW', 'OLD', 'ONE', 'TWO',
-        'WHY', 'HOW', 'WHO', 'MAY', 'WAY', 'DAY', 'GET', 'GOT', 'HAD', 'HAS',
-        'WILL', 'YEAR', 'WEEK', 'TIME', 'JUST', 'LIKE', 'MAKE', 'TAKE', 'LOOK',
-        'KNOW', 'THINK', 'WANT', 'NEED', 'GOOD', 'MUCH', 'MORE', 'VERY', 'WELL',
-        'ALSO', 'BACK', 'DOWN', 'EVEN', 'BEEN', 'FROM', 'HERE', 'ONLY', 'OVER',
-        'THAN', 'THEN', 'THEM', 'THEY', 'THIS', 'THAT', 'WHAT', 'WHEN', 'WITH',
-        'YOUR', 'HAVE', 'INTO', 'SOME', 'SAID', 'EACH', 'COME', 'MADE', 'MOST',
-        'LONG', 'DOES', 'SUCH', 'BOTH', 'MANY', 'MUST', 'CALL', 'NEXT', 'EVER',
-        'ONCE', 'DD', 'TA', 'FD', 'ATH', 'ATL', 'IPO', 'ETF', 'CEO', 'CFO',
-        'WSB', 'IMO', 'TBH', 'IMO', 'LOL', 'WTF', 'FYI', 'ASAP', 'FOMO', 'YOLO'
-    }
-    
-    # Find potential tickers (1-5 caps letters)
-    potential_tickers = re.findall(r'\b[A-Z]{1,5}\b', text)
-    
-    # Count non-common-word tickers
-    ticker_count = sum(1 for t in potential_tickers if t not in COMMON_WORDS)
-    
-    # If we found 1+ likely ticker, probably worth analyzing
-    return ticker_count >= 1
+    # Find potential tickers (1-5 caps letters), avoiding common words.
+    # One likely ticker is enough, so stop at the first one.
+    for match in TICKER_RE.finditer(text):
+        if match.group() not in _COMMON_WORDS:
+            return True
+    
+    return False
 
 
 def should_analyze_post(post, min_score: int = 10) -> bool:
@@ -65,9 +75,25 @@ def should_analyze_post(post, min_score: int = 10) -> bool:
     if post.score < min_score:
         return False
     
-    # Check if likely has tickers
-    text = f"{post.title}\n\n{post.selftext}"
-    return likely_has_ticker(text)
+    return should_analyze_text(post.title, post.selftext)
+
+
+def should_analyze_text(title: str, body: str) -> bool:
+    """
+    Ticker check of should_analyze_post, for callers that already hold the post text.
+    
+    Args:
+        title: Post title
+        body: Post selftext (empty for link/image posts)
+    
+    Returns:
+        True if post should be analyzed
+    """
+    # Check title and body separately instead of joining them; link/image
+    # posts have no body. Titles are short, so no length gate ("$TSLA").
+    if likely_has_ticker(title, min_length=1):
+        return True
+    return bool(body) and likely_has_ticker(body)
 
 
 def estimate_token_count(text: str) -> int:
@@ -83,36 +109,80 @@ def estimate_token_count(text: str) -> int:
     return len(text) // 4
 
 
-def batch_posts_by_tokens(posts: list, max_tokens: int = 98000) -> list:
+def batch_posts_by_tokens(posts: list, max_tokens: int = 98000, token_counts: list = None) -> list:
     """
     Batch posts together to maximize token usage per API call.
     
     Args:
         posts: List of post texts
         max_tokens: Maximum tokens per batch (default: 98K, maximizing 100K+ context windows)
+        token_counts: Token count per post, if already computed (default: estimate_token_count)
     
     Returns:
         List of batches, where each batch is a list of post texts
     """
+    # Greedy packing via cut points on the running token total: each batch
+    # ends at the last post whose cumulative count still fits
+    if token_counts is None:
+        token_counts = [estimate_token_count(post) for post in posts]
+    cumulative = list(accumulate(token_counts))
     batches = []
-    current_batch = []
-    current_tokens = 0
-    
-    for post in posts:
-        post_tokens = estimate_token_count(post)
-        
-        # If adding this post would exceed limit, start new batch
-        if current_tokens + post_tokens > max_tokens and current_batch:
-            batches.append(current_batch)
-            current_batch = []
-            current_tokens = 0
-        
-        current_batch.append(post)
-        current_tokens += post_tokens
-    
-    # Add remaining batch
-    if current_batch:
-        batches.append(current_batch)
+    start = 0
+    base = 0
+    
+    while start < len(posts):
+        end = bisect_right(cumulative, base + max_tokens, lo=start)
+        if end == start:  # A single post over the limit gets its own batch
+            end = start + 1
+        batches.append(posts[start:end])
+        base = cumulative[end - 1]
+        start = end
     
     return batches
 
+
+
+def optimal_token_batch(texts: list, token_counts: list = None, max_tokens: int = 98000) -> list:
+    """
+    Split texts (in order) into the fewest batches that fit max_tokens,
+    spreading tokens as evenly as possible across those batches.
+    
+    Greedy packing already reaches the minimum batch count for ordered
+    input, but leaves whatever is left over in a small final batch; this
+    DP keeps the same count while minimizing the largest batch.
+    
+    Args:
+        texts: List of texts
+        token_counts: Token count per text (default: estimate_token_count)
+        max_tokens: Maximum tokens per batch
+    
+    Returns:
+        List of batches, where each batch is a list of texts
+    """
+    if token_counts is None:
+        token_counts = [estimate_token_count(text) for text in texts]
+    n = len(texts)
+    prefix = [0, *accumulate(token_counts)]
+    
+    # best[j] = (batch count, largest batch) for texts[:j]; prev[j] = start of its last batch
+    best = [(0, 0)] + [None] * n
+    prev = [0] * (n + 1)
+    for j in range(1, n + 1):
+        for i in range(j - 1, -1, -1):
+            load = prefix[j] - prefix[i]
+            if load > max_tokens and i < j - 1:  # A single text over the limit gets its own batch
+                break
+            count, largest = best[i]
+            candidate = (count + 1, max(largest, load))
+            if best[j] is None or candidate < best[j]:
+                best[j] = candidate
+                prev[j] = i
+    
+    batches = []
+    end = n
+    while end:
+        start = prev[end]
+        batches.append(texts[start:end])
+        end = start
+    batches.reverse()
+    return batches
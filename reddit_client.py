@@ -1,33 +1,126 @@
 """Reddit API client for fetching posts and comments."""
+import threading
+import time
 import praw
-import re
-from typing import Set, Optional
+import prawcore
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set, Tuple
 from collections import Counter
 from config import (
     REDDIT_CLIENT_ID,
     REDDIT_CLIENT_SECRET,
     REDDIT_USER_AGENT,
-    TICKER_PATTERN,
+    TICKER_RE,
     COMMON_WORDS
 )
-from ticker_validator import fetch_valid_tickers
+from ticker_validator import get_valid_tickers
 
 
-def get_reddit_client() -> praw.Reddit:
-    """Create and return a Reddit API client."""
+# Concurrent comment fetches per subreddit scan; modest to stay within PRAW's rate limit
+COMMENT_FETCH_WORKERS = 8
+
+# One client for the whole process (see get_reddit_client)
+_reddit_client: Optional[praw.Reddit] = None
+_reddit_client_lock = threading.Lock()
+
+# Recent get_ticker_posts results, so repeat lookups within a process skip Reddit
+TICKER_POSTS_TTL = 900  # seconds
+_ticker_posts_cache: Dict[tuple, Tuple[float, list]] = {}
+
+# Reddit allows 100 requests/minute per OAuth app, shared by every client in
+# this process; a small burst lets a scan start without waiting
+REDDIT_REQUESTS_PER_MINUTE = 100
+REDDIT_REQUEST_BURST = 10
+
+
+class _TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_reddit_rate_limiter = _TokenBucket(REDDIT_REQUESTS_PER_MINUTE / 60.0, REDDIT_REQUEST_BURST)
+
+
+class _SharedRateLimitRequestor(prawcore.Requestor):
+    """
+    prawcore requestor that draws every request from the process-wide bucket.
+    
+    prawcore already paces the client from Reddit's X-Ratelimit headers, but
+    only after the fact, and many threads send through it at once; the
+    bucket keeps their combined rate under the quota up front.
+    """
+    
+    def request(self, *args, **kwargs):
+        _reddit_rate_limiter.acquire()
+        return super().request(*args, **kwargs)
+
+
+def _create_reddit_client() -> praw.Reddit:
+    """Create a new Reddit API client."""
     if not REDDIT_CLIENT_ID or not REDDIT_CLIENT_SECRET:
         raise ValueError(
             "Reddit API credentials not found. "
             "Please set REDDIT_CLIENT_ID and REDDIT_CLIENT_SECRET in .env file"
         )
     
+    # Every worker thread sends through this session: size its connection
+    # pool for them instead of urllib3's default of 10
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+    
     return praw.Reddit(
         client_id=REDDIT_CLIENT_ID,
         client_secret=REDDIT_CLIENT_SECRET,
-        user_agent=REDDIT_USER_AGENT
+        user_agent=REDDIT_USER_AGENT,
+        requestor_class=_SharedRateLimitRequestor,
+        requestor_kwargs={'session': session}
     )
 
 
+def get_reddit_client() -> praw.Reddit:
+    """
+    Return the process-wide Reddit API client, creating it on first use.
+    
+    Sharing one client keeps a single auth token and HTTP session (and so
+    its pooled connections) for the whole run, however many short-lived
+    worker threads use it; everything sent through it is a read-only fetch.
+    """
+    global _reddit_client
+    reddit = _reddit_client
+    if reddit is None:
+        with _reddit_client_lock:
+            if _reddit_client is None:
+                _reddit_client = _create_reddit_client()
+            reddit = _reddit_client
+    return reddit
+
+
+def _post_text(post) -> str:
+    """Title plus body text; link/image posts (empty selftext) reuse the title as-is."""
+    selftext = post.selftext
+    return f"{post.title} {selftext}" if selftext else post.title
+
+
 def extract_tickers(text: str, valid_tickers: Optional[Set[str]] = None) -> Set[str]:
     """
     Extract valid stock tickers from text.
@@ -39,17 +132,20 @@ def extract_tickers(text: str, valid_tickers: Optional[Set[str]] = None) -> Set[
     Returns:
         Set of valid stock tickers
     """
+    # Fast path: all-lowercase text has no uppercase runs, so skip the regex
+    if text.islower():
+        return set()
+    
     # Fetch valid tickers if not provided
     if valid_tickers is None:
-        valid_tickers = fetch_valid_tickers()
-    
-    # Find all potential tickers
-    potential_tickers = set(re.findall(TICKER_PATTERN, text))
+        valid_tickers = get_valid_tickers()
     
-    # Filter: remove common words AND validate against real stock symbols
-    tickers = (potential_tickers - COMMON_WORDS) & valid_tickers
-    
-    return tickers
+    # Keep candidates that aren't common words AND are real stock symbols,
+    # building only the result set (no intermediate sets)
+    return {
+        token for token in TICKER_RE.findall(text)
+        if token not in COMMON_WORDS and token in valid_tickers
+    }
 
 
 def get_subreddit_tickers(subreddit_name: str, timeframe: str, limit: int = 100) -> Counter:
@@ -69,8 +165,8 @@ def get_subreddit_tickers(subreddit_name: str, timeframe: str, limit: int = 100)
     
     ticker_counter: Counter = Counter()
     
-    # Fetch valid tickers once (cached for 24 hours)
-    valid_tickers = fetch_valid_tickers()
+    # Valid tickers (shared across calls, refreshed daily)
+    valid_tickers = get_valid_tickers()
     
     # Map timeframe to Reddit time filter
     time_filters = {
@@ -81,22 +177,30 @@ def get_subreddit_tickers(subreddit_name: str, timeframe: str, limit: int = 100)
     
     time_filter = time_filters.get(timeframe, 'day')
     
+    def _count_post(post_id: str, text: str) -> Counter:
+        """Count tickers in a post and its top comments (runs in a worker thread)."""
+        counter = Counter(extract_tickers(text, valid_tickers))
+        
+        # Extract tickers from top comments
+        try:
+            submission = get_reddit_client().submission(id=post_id)
+            submission.comments.replace_more(limit=0)  # Skip "load more comments"
+            for comment in submission.comments.list()[:50]:  # Limit to top 50 comments
+                counter.update(extract_tickers(comment.body, valid_tickers))
+        except Exception:
+            pass  # Skip if comments fail to load
+        return counter
+    
     try:
-        # Get hot posts from the specified timeframe
-        for post in subreddit.top(time_filter=time_filter, limit=limit):
-            # Extract tickers from post title and body
-            text = f"{post.title} {post.selftext}"
-            tickers = extract_tickers(text, valid_tickers)
-            ticker_counter.update(tickers)
-            
-            # Extract tickers from top comments
-            try:
-                post.comments.replace_more(limit=0)  # Skip "load more comments"
-                for comment in post.comments.list()[:50]:  # Limit to top 50 comments
-                    comment_tickers = extract_tickers(comment.body, valid_tickers)
-                    ticker_counter.update(comment_tickers)
-            except Exception:
-                continue  # Skip if comments fail to load
+        # Get hot posts from the specified timeframe; comment trees are
+        # fetched concurrently since each one is a blocking HTTP round trip
+        with ThreadPoolExecutor(max_workers=COMMENT_FETCH_WORKERS) as executor:
+            futures = [
+                executor.submit(_count_post, post.id, _post_text(post))
+                for post in subreddit.top(time_filter=time_filter, limit=limit)
+            ]
+            for future in futures:
+                ticker_counter.update(future.result())
                 
     except Exception as e:
         print(f"Error fetching from r/{subreddit_name}: {e}")
@@ -116,44 +220,51 @@ def get_ticker_posts(subreddit_name: str, ticker: str, limit: int = 50) -> list:
     Returns:
         List of posts containing the ticker
     """
+    cache_key = (subreddit_name, ticker, limit)
+    entry = _ticker_posts_cache.get(cache_key)
+    if entry is not None and time.monotonic() - entry[0] < TICKER_POSTS_TTL:
+        return list(entry[1])
+    
     reddit = get_reddit_client()
     subreddit = reddit.subreddit(subreddit_name)
     
     # Fetch valid tickers once
-    valid_tickers = fetch_valid_tickers()
+    valid_tickers = get_valid_tickers()
     
     posts = []
+    # Every post checked so far, matched or not: search and hot feeds overlap,
+    # and a post's verdict never changes within one crawl
+    checked_ids = set()
+    
+    def _collect(post):
+        """Add post if it's new and actually mentions the ticker."""
+        if post.id in checked_ids:
+            return
+        checked_ids.add(post.id)
+        text = _post_text(post)
+        # Cheap substring check before the full regex + validation pass
+        if ticker in text and ticker in extract_tickers(text, valid_tickers):
+            posts.append({
+                'id': post.id,
+                'title': post.title,
+                'text': text,
+                'score': post.score,
+                'url': post.url
+            })
     
     try:
         # Search for ticker in the subreddit (past week)
         for post in subreddit.search(ticker, time_filter='week', limit=limit):
-            # Verify ticker is actually mentioned
-            text = f"{post.title} {post.selftext}"
-            if ticker in extract_tickers(text, valid_tickers):
-                posts.append({
-                    'id': post.id,
-                    'title': post.title,
-                    'text': text,
-                    'score': post.score,
-                    'url': post.url
-                })
+            _collect(post)
         
         # Also check hot posts for mentions
         for post in subreddit.hot(limit=limit):
-            text = f"{post.title} {post.selftext}"
-            if ticker in extract_tickers(text, valid_tickers):
-                # Avoid duplicates
-                if not any(p['id'] == post.id for p in posts):
-                    posts.append({
-                        'id': post.id,
-                        'title': post.title,
-                        'text': text,
-                        'score': post.score,
-                        'url': post.url
-                    })
+            _collect(post)
     
     except Exception as e:
         print(f"Error fetching ticker posts from r/{subreddit_name}: {e}")
+        return posts  # Partial result; not cached
     
-    return posts
+    _ticker_posts_cache[cache_key] = (time.monotonic(), posts)
+    return list(posts)
 
@@ -2,13 +2,53 @@
 Reddit API client with AGGREGATED LLM extraction.
 Sends 20-40 posts per request (60-80K tokens) with concise aggregated output.
 """
-from typing import Any
-from collections import Counter
-from ticker_validator import fetch_valid_tickers
+import heapq
+import logging
+import statistics
+import threading
+from operator import itemgetter
+from typing import Any, List
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from config import EARLY_STOP_MIN_NOVEL, EARLY_STOP_WINDOW
+from ticker_validator import get_valid_tickers
 from llm_extractor_aggregated import extract_tickers_aggregated
-from reddit_client import get_reddit_client
-from comment_filter import filter_comments
-from post_filter import should_analyze_post, batch_posts_by_tokens, estimate_token_count
+from reddit_client import COMMENT_FETCH_WORKERS, get_reddit_client
+from comment_filter import filter_comments, should_skip_post_flair
+from post_filter import should_analyze_text, optimal_token_batch, estimate_token_count
+
+logger = logging.getLogger(__name__)
+
+# Listing ceiling, as a multiple of the requested post count
+MAX_SCAN_FACTOR = 5
+# Aggregated LLM requests kept in flight at once, across all concurrent
+# subreddit scans (they share one pool of slots)
+LLM_CONCURRENCY = 4
+_llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
+# Top-quartile posts (by score) get this many times comments_per_post
+TOP_POST_COMMENT_FACTOR = 3
+
+
+def _fetch_top_comments(post_id: str, comments_per_post: int) -> List[dict]:
+    """
+    Fetch a post's top comments (runs in a worker thread).
+    
+    Args:
+        post_id: Reddit submission id
+        comments_per_post: Number of top comments to keep
+        
+    Returns:
+        List of comment dicts with 'body', 'score' and 'post_id'
+    """
+    submission = get_reddit_client().submission(id=post_id)
+    submission.comment_sort = 'top'
+    submission.comments.replace_more(limit=0)
+    
+    return [
+        {'body': comment.body, 'score': comment.score, 'post_id': post_id}
+        for comment in submission.comments.list()[:comments_per_post]
+        if len(comment.body) > 20
+    ]
 
 
 def get_subreddit_tickers_llm(
@@ -25,7 +65,7 @@ def get_subreddit_tickers_llm(
     """
     reddit = get_reddit_client()
     subreddit = reddit.subreddit(subreddit_name)
-    valid_tickers = fetch_valid_tickers()
+    valid_tickers = get_valid_tickers()
     
     ticker_counter: Counter = Counter()
     
@@ -34,135 +74,180 @@ def get_subreddit_tickers_llm(
     print(f"  Fetching {limit} posts from r/{subreddit_name}...")
     
     # Phase 1: Collect posts with pre-filtering
-    all_posts = []
-    top_comments_collected = []
+    # Only ids and prompt text are kept, not the PRAW Submission objects
+    post_ids = []
+    post_scores = []
+    post_texts = []
+    # Min-heap of the best global_top_comments comments so far: (score, -arrival, comment),
+    # so among equal scores the earliest-collected comment is kept
+    top_comments_heap = []
+    comments_collected = 0
     filtered_flairs = 0
     filtered_low_score = 0
     filtered_no_tickers = 0
     
-    SKIP_FLAIRS = ['gain', 'loss', 'gain/loss', 'gains', 'losses', 'meme']
-    
     try:
-        for post in subreddit.top(time_filter=time_filter, limit=limit * 3):
-            if len(all_posts) >= limit:
+        # PRAW pages the listing lazily, so breaking at `limit` stops further
+        # requests; the ceiling only bounds how far we dig when filters reject a lot
+        max_scan = limit * MAX_SCAN_FACTOR
+        for post in subreddit.top(time_filter=time_filter, limit=max_scan):
+            if len(post_ids) >= limit:
                 break
             
             # Filter by flair
-            flair = (post.link_flair_text or '').lower()
-            if any(skip_flair in flair for skip_flair in SKIP_FLAIRS):
+            if should_skip_post_flair(post.link_flair_text):
                 filtered_flairs += 1
                 continue
             
             # Pre-filter: Check upvotes and likely ticker presence
-            if post.score < 10:
+            score = post.score
+            if score < 10:
                 filtered_low_score += 1
                 continue
             
-            if not should_analyze_post(post, min_score=10):
+            # Read the text once: for the ticker check and for the LLM prompt
+            title, body = post.title, post.selftext
+            if not should_analyze_text(title, body):
                 filtered_no_tickers += 1
                 continue
             
-            all_posts.append(post)
-            
-            # Collect comments
-            post.comment_sort = 'top'
-            post.comments.replace_more(limit=0)
-            
-            post_top_comments = post.comments.list()[:comments_per_post]
-            
-            for comment in post_top_comments:
-                if len(comment.body) > 20:
-                    top_comments_collected.append({
-                        'body': comment.body,
-                        'score': comment.score,
-                        'post_id': post.id
-                    })
+            post_ids.append(post.id)
+            post_scores.append(score)
+            post_texts.append(f"TITLE: {title}\n\nBODY: {body}")
     
     except Exception as e:
         print(f"Error fetching posts: {e}")
         return ticker_counter
     
+    # Spend comment fetches where the engagement is: posts in the top quartile
+    # by score get more comments, posts below the median get none
+    if len(post_scores) >= 2:
+        _, median_score, top_quartile_score = statistics.quantiles(post_scores, n=4)
+    else:
+        median_score, top_quartile_score = float('-inf'), float('inf')
+    
+    fetch_jobs = []
+    for post_id, score in zip(post_ids, post_scores):
+        if score >= top_quartile_score:
+            fetch_jobs.append((post_id, comments_per_post * TOP_POST_COMMENT_FACTOR))
+        elif score >= median_score:
+            fetch_jobs.append((post_id, comments_per_post))
+    
+    # Collect comments: one blocking round trip per post, so run them concurrently
+    def _safe_fetch(job: tuple) -> List[dict]:
+        post_id, count = job
+        try:
+            return _fetch_top_comments(post_id, count)
+        except Exception as e:
+            logger.warning("Error fetching comments for %s: %s", post_id, e)
+            return []
+    
+    with ThreadPoolExecutor(max_workers=COMMENT_FETCH_WORKERS) as executor:
+        for comments in executor.map(_safe_fetch, fetch_jobs):
+            for comment in comments:
+                entry = (comment['score'], -comments_collected, comment)
+                comments_collected += 1
+                if len(top_comments_heap) < global_top_comments:
+                    heapq.heappush(top_comments_heap, entry)
+                elif top_comments_heap and entry[:2] > top_comments_heap[0][:2]:
+                    heapq.heapreplace(top_comments_heap, entry)
+    
     # Report filtering stats
     total_filtered = filtered_flairs + filtered_low_score + filtered_no_tickers
     if total_filtered > 0:
-        print(f"  📊 Pre-filter: {len(all_posts)} posts kept, {total_filtered} filtered")
+        print(f"  📊 Pre-filter: {len(post_ids)} posts kept, {total_filtered} filtered")
         print(f"     └─ Flair: {filtered_flairs}, Low score: {filtered_low_score}, No tickers: {filtered_no_tickers}")
-    print(f"  Collected {len(all_posts)} posts, {len(top_comments_collected)} comments")
+    print(f"  Collected {len(post_ids)} posts, {comments_collected} comments")
+    
+    # Phase 2: Select comments, highest score first (earliest first among ties)
+    sorted_comments = [entry[2] for entry in sorted(top_comments_heap, key=itemgetter(0, 1), reverse=True)]
+    
+    # Filter comments
+    quality_comments, filter_stats = filter_comments(sorted_comments, min_length=40, verbose=True)
     
-    # Phase 2: AGGREGATED POST ANALYSIS (60-80K tokens per request)
+    # Send each distinct comment once (whitespace-normalized, as in the LLM
+    # cache key): verbatim copies from bots and copypasta would only repeat
+    # the same tokens in a batch and inflate their tickers' counts
+    unique_comments = {}
+    for comment in quality_comments:
+        unique_comments.setdefault(' '.join(comment['body'].split()), comment['body'])
+    comment_texts = list(unique_comments.values())
+    if len(comment_texts) < len(quality_comments):
+        print(f"  🔁 Skipped {len(quality_comments) - len(comment_texts)} duplicate comments")
+    
+    # Phase 3: AGGREGATED ANALYSIS (60-80K tokens per request)
+    # Posts and comments go through the same extraction, so pack them together:
+    # a part-full post batch and a part-full comment batch become one request
     print(f"  Creating aggregated batches (60-80K tokens each)...")
+    texts = post_texts + comment_texts
+    token_counts = [estimate_token_count(t) for t in texts]
     
-    post_texts = []
-    for post in all_posts:
-        text = f"TITLE: {post.title}\n\nBODY: {post.selftext}"
-        if len(text.strip()) > 10:
-            post_texts.append(text)
+    # Pack in order of size, longest first: similar-sized texts share batches,
+    # which fragments less, and a budget cut-off drops the shortest texts
+    order = sorted(range(len(texts)), key=token_counts.__getitem__, reverse=True)
+    texts = [texts[i] for i in order]
+    token_counts = [token_counts[i] for i in order]
     
     # Batch to 60-80K tokens (leaving room for reasoning)
-    post_batches = batch_posts_by_tokens(post_texts, max_tokens=75000)
+    batches = optimal_token_batch(texts, token_counts, max_tokens=75000)
     
-    if post_batches:
-        total_tokens_estimate = sum(estimate_token_count(p) for p in post_texts)
-        print(f"  Created {len(post_batches)} batches (~{total_tokens_estimate:,} tokens total)")
+    if batches:
+        print(f"  Created {len(batches)} batches from {len(post_texts)} posts + "
+              f"{len(comment_texts)} comments (~{sum(token_counts):,} tokens total)")
     
-    for batch_idx, batch in enumerate(post_batches):
-        if model_manager.check_budget() <= 0:
-            print(f"⚠️  Budget exhausted at batch {batch_idx+1}/{len(post_batches)}")
-            break
-        
-        batch_tokens = sum(estimate_token_count(p) for p in batch)
-        print(f"    Batch {batch_idx+1}/{len(post_batches)}: {len(batch)} posts, ~{batch_tokens:,} tokens...", end='', flush=True)
-        
-        # Send batch and get AGGREGATED result
-        result = extract_tickers_aggregated(batch, model_manager, valid_tickers)
-        
-        if not result or not result.get('tickers'):
-            print(f" no results")
-            continue
-        
-        # Update counter with aggregated mentions
-        for ticker, data in result['tickers'].items():
-            mentions = data.get('mentions', 1)
-            ticker_counter[ticker] += mentions
-        
-        print(f" ✓ Found {len(result['tickers'])} tickers (saved {len(batch)-1} calls)")
+    # Each batch costs at least one request; drop what the budget can't cover
+    budget = model_manager.check_budget()
+    if len(batches) > budget:
+        print(f"⚠️  Budget covers only {budget}/{len(batches)} batches")
+        batches = batches[:budget]
     
-    print(f"  ✓ Analyzed {len(post_texts)} posts in {len(post_batches)} API requests")
+    # Batches are independent, so keep several requests in flight; a batch
+    # still waiting for a slot when we stop early is dropped, not sent
+    stop = threading.Event()
     
-    # Phase 3: AGGREGATED COMMENT ANALYSIS
-    sorted_comments = sorted(
-        top_comments_collected,
-        key=lambda c: c['score'],
-        reverse=True
-    )[:global_top_comments]
+    def _extract(batch: List[str]):
+        with _llm_slots:
+            if stop.is_set():
+                return None
+            return extract_tickers_aggregated(batch, model_manager, valid_tickers)
     
-    # Filter comments
-    quality_comments, filter_stats = filter_comments(sorted_comments, min_length=40, verbose=True)
-    
-    if quality_comments:
-        print(f"  Analyzing {len(quality_comments)} quality comments...")
-        
-        # Batch comments to 60-80K tokens
-        comment_texts = [c['body'] for c in quality_comments]
-        comment_batches = batch_posts_by_tokens(comment_texts, max_tokens=75000)
+    with ThreadPoolExecutor(max_workers=LLM_CONCURRENCY) as executor:
+        futures = [executor.submit(_extract, batch) for batch in batches]
         
-        for batch_idx, batch in enumerate(comment_batches):
-            if model_manager.check_budget() <= 0:
-                break
-            
-            batch_tokens = sum(estimate_token_count(c) for c in batch)
-            print(f"    Comment batch {batch_idx+1}: {len(batch)} comments, ~{batch_tokens:,} tokens...", end='', flush=True)
+        # New tickers found by each of the most recent batches
+        recent_novel = deque(maxlen=EARLY_STOP_WINDOW)
+        offset = 0
+        for batch_idx, (batch, future) in enumerate(zip(batches, futures)):
+            result = future.result()
+            batch_tokens = sum(token_counts[offset:offset + len(batch)])
+            offset += len(batch)
+            progress = f"    Batch {batch_idx+1}/{len(batches)}: {len(batch)} texts, ~{batch_tokens:,} tokens..."
             
-            result = extract_tickers_aggregated(batch, model_manager, valid_tickers)
-            
-            if result and result.get('tickers'):
-                for ticker, data in result['tickers'].items():
-                    mentions = data.get('mentions', 1)
-                    ticker_counter[ticker] += mentions
-                
-                print(f" ✓ Found {len(result['tickers'])} tickers")
+            if not result or not result.get('tickers'):
+                print(f"{progress} no results")
+                recent_novel.append(0)
             else:
-                print(f" no results")
+                recent_novel.append(sum(1 for ticker in result['tickers'] if ticker not in ticker_counter))
+                
+                # Update counter with aggregated mentions
+                ticker_counter.update({
+                    ticker: data.get('mentions', 1)
+                    for ticker, data in result['tickers'].items()
+                })
+                
+                print(f"{progress} ✓ Found {len(result['tickers'])} tickers (saved {len(batch)-1} calls)")
+            
+            # Stop once recent batches barely add tickers; requests not yet started are dropped
+            remaining = futures[batch_idx + 1:]
+            if (remaining and len(recent_novel) == EARLY_STOP_WINDOW
+                    and sum(recent_novel) < EARLY_STOP_MIN_NOVEL):
+                stop.set()
+                cancelled = sum(pending.cancel() for pending in remaining)
+                print(f"  ⏹️  Early stop: last {EARLY_STOP_WINDOW} batches found {sum(recent_novel)} new tickers "
+                      f"({cancelled} requests skipped)")
+                break
+    
+    print(f"  ✓ Analyzed {len(texts)} texts in {len(batches)} API requests")
     
     print(f"  📊 Budget: {model_manager.get_stats()}")
     
@@ -180,18 +265,15 @@ def get_ticker_sentiment_llm(
     reddit = get_reddit_client()
     subreddit = reddit.subreddit(subreddit_name)
     
-    valid_tickers = fetch_valid_tickers()
+    valid_tickers = get_valid_tickers()
     posts = []
     
     try:
-        SKIP_FLAIRS = ['gain', 'loss', 'gain/loss', 'gains', 'losses', 'meme']
-        
         for post in subreddit.search(ticker, time_filter='week', limit=limit * 2):
             if model_manager.check_budget() <= 0:
                 break
             
-            flair = (post.link_flair_text or '').lower()
-            if any(skip_flair in flair for skip_flair in SKIP_FLAIRS):
+            if should_skip_post_flair(post.link_flair_text):
                 continue
                 
             text = f"{post.title}\n\n{post.selftext}"
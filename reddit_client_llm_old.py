@@ -2,15 +2,23 @@
 Reddit API client with LLM-enhanced extraction.
 Uses Reddit's native comment sorting and batch analysis for efficiency.
 """
+import heapq
+from operator import itemgetter
 from typing import Any
 from collections import Counter
-from ticker_validator import fetch_valid_tickers
-from llm_extractor import extract_tickers_with_llm, extract_tickers_batch
+from ticker_validator import get_valid_tickers
+from llm_extractor import batch_extract_tickers, extract_tickers_with_llm, extract_tickers_batch
 from reddit_client import get_reddit_client
 from comment_filter import filter_comments
 from post_filter import should_analyze_post, batch_posts_by_tokens, estimate_token_count
 
 
+# Listing ceiling, as a multiple of the requested post count
+MAX_SCAN_FACTOR = 5
+# Posts verified per LLM request in get_ticker_sentiment_llm
+LLM_BATCH_SIZE = 10
+
+
 def get_subreddit_tickers_llm(
     subreddit_name: str,
     timeframe: str,
@@ -37,7 +45,7 @@ def get_subreddit_tickers_llm(
     """
     reddit = get_reddit_client()
     subreddit = reddit.subreddit(subreddit_name)
-    valid_tickers = fetch_valid_tickers()
+    valid_tickers = get_valid_tickers()
     
     ticker_counter: Counter = Counter()
     
@@ -56,7 +64,10 @@ def get_subreddit_tickers_llm(
     SKIP_FLAIRS = ['gain', 'loss', 'gain/loss', 'gains', 'losses', 'meme']
     
     try:
-        for post in subreddit.top(time_filter=time_filter, limit=limit * 3):  # Fetch 3x to compensate for filtering
+        # PRAW pages the listing lazily, so breaking at `limit` stops further
+        # requests; the ceiling only bounds how far we dig when filters reject a lot
+        max_scan = limit * MAX_SCAN_FACTOR
+        for post in subreddit.top(time_filter=time_filter, limit=max_scan):
             if len(all_posts) >= limit:
                 break
             
@@ -139,12 +150,8 @@ def get_subreddit_tickers_llm(
     
     print(f"  Analyzed {posts_analyzed} posts in {batch_idx+1 if post_batches else 0} API requests")
     
-    # Phase 2b: Re-sort comments globally and take top X
-    sorted_comments = sorted(
-        top_comments_collected,
-        key=lambda c: c['score'],
-        reverse=True
-    )[:global_top_comments]
+    # Phase 2b: Take the top X comments globally (partial sort, earliest first among ties)
+    sorted_comments = heapq.nlargest(global_top_comments, top_comments_collected, key=itemgetter('score'))
     
     # Phase 2b-2: Filter out low-quality comments BEFORE LLM
     quality_comments, filter_stats = filter_comments(sorted_comments, min_length=40, verbose=True)
@@ -222,8 +229,11 @@ def get_ticker_sentiment_llm(
     reddit = get_reddit_client()
     subreddit = reddit.subreddit(subreddit_name)
     
-    valid_tickers = fetch_valid_tickers()
+    valid_tickers = get_valid_tickers()
     posts = []
+    # Candidate posts, deduplicated across search and hot (which often overlap)
+    candidates = []
+    seen_ids = set()
     
     try:
         # Flairs to skip
@@ -231,47 +241,47 @@ def get_ticker_sentiment_llm(
         
         # Search for ticker
         for post in subreddit.search(ticker, time_filter='week', limit=limit * 2):
-            if model_manager.check_budget() <= 0:
-                break
-            
             # Filter by flair
             flair = (post.link_flair_text or '').lower()
             if any(skip_flair in flair for skip_flair in SKIP_FLAIRS):
                 continue
-                
-            text = f"{post.title}\n\n{post.selftext}"
-            
-            # Use LLM to verify and extract context
-            result = extract_tickers_with_llm(text, model_manager, valid_tickers)
             
-            if ticker in result['tickers']:
+            if post.id not in seen_ids:
+                seen_ids.add(post.id)
+                candidates.append(post)
+        
+        # Also check hot posts
+        for post in subreddit.hot(limit=limit):
+            if post.id not in seen_ids:
+                seen_ids.add(post.id)
+                candidates.append(post)
+        
+        # Verify every candidate with batched LLM requests instead of one per post,
+        # reading as much of each post as the single-post prompt did (1000
+        # chars) and counting company names, which a search hit may use alone
+        max_posts = model_manager.check_budget() * LLM_BATCH_SIZE
+        candidates = candidates[:max_posts]
+        texts = [f"{post.title}\n\n{post.selftext}" for post in candidates]
+        results = batch_extract_tickers(
+            texts, model_manager, valid_tickers, batch_size=LLM_BATCH_SIZE,
+            max_chars=1000, company_names=True
+        )
+        
+        for post, text, result in zip(candidates, texts, results):
+            if ticker in result.get('tickers', ()):
+                # Batch answers describe each post in one string; keep only this
+                # ticker's entry if a model answers per ticker instead
+                context = result.get('context', '')
+                if isinstance(context, dict):
+                    context = context.get(ticker, '')
                 posts.append({
                     'id': post.id,
                     'title': post.title,
                     'text': text,
                     'score': post.score,
                     'url': post.url,
-                    'llm_context': result['context'].get(ticker, '')
+                    'llm_context': context
                 })
-        
-        # Also check hot posts
-        for post in subreddit.hot(limit=limit):
-            if model_manager.check_budget() <= 0:
-                break
-                
-            text = f"{post.title}\n\n{post.selftext}"
-            result = extract_tickers_with_llm(text, model_manager, valid_tickers)
-            
-            if ticker in result['tickers']:
-                if not any(p['id'] == post.id for p in posts):
-                    posts.append({
-                        'id': post.id,
-                        'title': post.title,
-                        'text': text,
-                        'score': post.score,
-                        'url': post.url,
-                        'llm_context': result['context'].get(ticker, '')
-                    })
     
     except Exception as e:
         print(f"Error fetching ticker posts from r/{subreddit_name}: {e}")
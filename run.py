@@ -15,7 +15,6 @@ Examples:
     python run.py analyze-ai TSLA -s 1-5
 """
 import sys
-import argparse
 
 
 def show_help():
@@ -151,13 +150,13 @@ def main():
         elif command == 'budget':
             # Set or view daily LLM request budget
             import argparse
-            from llm_manager import MultiModelManager
+            from llm_manager import get_model_manager
             parser = argparse.ArgumentParser(description='Set or view daily LLM request budget')
             parser.add_argument('-s', '--set', type=int, help='Set daily request budget (e.g., 500)')
             parser.add_argument('-r', '--reset', action='store_true', help='Reset usage counters for the new day')
             args = parser.parse_args(sys.argv[1:])
 
-            manager = MultiModelManager()
+            manager = get_model_manager()
             if args.set is not None:
                 try:
                     manager.set_limit(args.set)
@@ -212,8 +211,8 @@ def main():
                 print("Example: python run.py convex-reeval AAPL\n")
                 sys.exit(1)
             from convex_tracker import revaluate_stock
-            from llm_manager import MultiModelManager
-            import os
+            from llm_manager import get_model_manager
+            from config import OPENROUTER_API_KEY
             from setup_checker import check_setup, prompt_openrouter_setup
             
             is_setup, message = check_setup()
@@ -221,12 +220,12 @@ def main():
                 print(message)
                 sys.exit(1)
             
-            if not os.getenv('OPENROUTER_API_KEY'):
+            if not OPENROUTER_API_KEY:
                 print(prompt_openrouter_setup())
                 sys.exit(1)
             
             ticker = sys.argv[1].upper()
-            model_manager = MultiModelManager()
+            model_manager = get_model_manager()
             revaluate_stock(ticker, model_manager)
             
         else:
@@ -5,15 +5,25 @@ Usage:
     python sentiment_analyzer.py AAPL
     python sentiment_analyzer.py TSLA
 """
-import argparse
+import heapq
+import sys
+from collections import Counter
+from functools import cache
+from operator import itemgetter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from config import STOCK_SUBREDDITS
-from database import init_database, save_sentiment
+from database import init_database, save_sentiment_many
 from reddit_client import get_ticker_posts
 from setup_checker import check_setup
 
 
+@cache
+def get_analyzer() -> SentimentIntensityAnalyzer:
+    """Return the process-wide VADER analyzer (its lexicon is only read, so threads share it)."""
+    return SentimentIntensityAnalyzer()
+
+
 def analyze_sentiment(text: str, analyzer: SentimentIntensityAnalyzer) -> float:
     """
     Analyze sentiment of text using VADER.
@@ -25,10 +35,32 @@ def analyze_sentiment(text: str, analyzer: SentimentIntensityAnalyzer) -> float:
     Returns:
         Compound sentiment score (-1 to 1)
     """
+    # Nothing to score (e.g. link posts); VADER would return 0.0 as well
+    if not text or text.isspace():
+        return 0.0
     scores = analyzer.polarity_scores(text)
     return scores['compound']
 
 
+def analyze_sentiments(texts: list, analyzer: SentimentIntensityAnalyzer) -> list:
+    """
+    Analyze sentiment of many texts, scoring each distinct text once.
+    
+    Args:
+        texts: Texts to analyze
+        analyzer: VADER sentiment analyzer instance
+        
+    Returns:
+        Compound sentiment scores (-1 to 1), in the same order as texts
+    """
+    polarity_scores = analyzer.polarity_scores
+    compound_by_text = {'': 0.0}
+    for text in texts:
+        if text not in compound_by_text:
+            compound_by_text[text] = 0.0 if text.isspace() else polarity_scores(text)['compound']
+    return [compound_by_text[text] for text in texts]
+
+
 def process_subreddit_sentiment(subreddit_name: str, ticker: str, analyzer: SentimentIntensityAnalyzer) -> list:
     """
     Process sentiment for a ticker in a single subreddit.
@@ -44,20 +76,23 @@ def process_subreddit_sentiment(subreddit_name: str, ticker: str, analyzer: Sent
     print(f"Analyzing r/{subreddit_name}...")
     
     posts = get_ticker_posts(subreddit_name, ticker)
-    sentiments = []
-    
-    for post in posts:
-        sentiment_score = analyze_sentiment(post['text'], analyzer)
-        sentiments.append({
+    scores = analyze_sentiments([post['text'] for post in posts], analyzer)
+    sentiments = [
+        {
             'subreddit': subreddit_name,
             'post_id': post['id'],
             'sentiment': sentiment_score,
             'title': post['title'],
             'score': post['score']
-        })
-        
-        # Save to database
-        save_sentiment(ticker, subreddit_name, post['id'], sentiment_score)
+        }
+        for post, sentiment_score in zip(posts, scores)
+    ]
+    
+    # Save to database in one transaction
+    save_sentiment_many([
+        (ticker, subreddit_name, s['post_id'], s['sentiment'])
+        for s in sentiments
+    ])
     
     print(f"✓ r/{subreddit_name}: Analyzed {len(sentiments)} posts")
     
@@ -79,12 +114,20 @@ def analyze_stock_sentiment(ticker: str):
     
     # Initialize database and sentiment analyzer
     init_database()
-    analyzer = SentimentIntensityAnalyzer()
-    
-    # Process all subreddits in parallel
-    all_sentiments = []
-    
-    with ThreadPoolExecutor(max_workers=5) as executor:
+    analyzer = get_analyzer()
+    
+    # Process all subreddits in parallel: the work is almost all waiting on
+    # Reddit, so give every subreddit its own thread (all share one PRAW
+    # client and the process-wide Reddit rate limiter).
+    # Results are folded into running totals as each subreddit finishes, so
+    # the per-post records aren't kept around and re-walked afterwards.
+    total_posts = 0
+    total_sentiment = 0.0
+    positive_count = negative_count = 0
+    subreddit_counts: Counter = Counter()
+    top_posts: list = []  # Top 3 by Reddit score
+    
+    with ThreadPoolExecutor(max_workers=len(STOCK_SUBREDDITS)) as executor:
         # Submit all tasks
         future_to_subreddit = {
             executor.submit(process_subreddit_sentiment, sub, ticker, analyzer): sub
@@ -93,34 +136,42 @@ def analyze_stock_sentiment(ticker: str):
         
         # Collect results as they complete
         for future in as_completed(future_to_subreddit):
+            subreddit = future_to_subreddit[future]
             try:
                 sentiments = future.result()
-                all_sentiments.extend(sentiments)
             except Exception as e:
-                subreddit = future_to_subreddit[future]
                 print(f"✗ Error processing r/{subreddit}: {e}")
+                continue
+            
+            for post in sentiments:
+                score = post['sentiment']
+                total_sentiment += score
+                if score > 0.05:
+                    positive_count += 1
+                elif score < -0.05:
+                    negative_count += 1
+            total_posts += len(sentiments)
+            if sentiments:
+                subreddit_counts[subreddit] += len(sentiments)
+            top_posts = heapq.nlargest(3, top_posts + sentiments, key=itemgetter('score'))
     
     # Calculate overall sentiment
-    if not all_sentiments:
+    if not total_posts:
         print(f"\n⚠ No recent mentions found for ${ticker}")
         print("Try a different ticker or check back later.\n")
         return
     
-    # Aggregate sentiment statistics
-    sentiment_scores = [s['sentiment'] for s in all_sentiments]
-    avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
-    
-    positive_count = sum(1 for s in sentiment_scores if s > 0.05)
-    negative_count = sum(1 for s in sentiment_scores if s < -0.05)
-    neutral_count = len(sentiment_scores) - positive_count - negative_count
-    
-    # Display results
-    print(f"\n{'='*60}")
-    print(f"SENTIMENT ANALYSIS RESULTS - ${ticker}")
-    print(f"{'='*60}\n")
+    avg_sentiment = total_sentiment / total_posts
+    neutral_count = total_posts - positive_count - negative_count
     
-    print(f"Total Posts Analyzed: {len(all_sentiments)}")
-    print(f"\nOverall Sentiment Score: {avg_sentiment:.3f}")
+    # Display results, written out in one go
+    lines = [
+        f"\n{'='*60}",
+        f"SENTIMENT ANALYSIS RESULTS - ${ticker}",
+        f"{'='*60}\n",
+        f"Total Posts Analyzed: {total_posts}",
+        f"\nOverall Sentiment Score: {avg_sentiment:.3f}",
+    ]
     
     # Sentiment interpretation
     if avg_sentiment >= 0.05:
@@ -130,61 +181,55 @@ def analyze_stock_sentiment(ticker: str):
     else:
         sentiment_label = "NEUTRAL ➡️"
     
-    print(f"Overall Sentiment: {sentiment_label}\n")
-    
-    # Sentiment breakdown
-    print(f"{'Sentiment':<15} {'Count':<10} {'Percentage':<10}")
-    print(f"{'-'*35}")
-    print(f"{'Positive':<15} {positive_count:<10} {(positive_count/len(all_sentiments)*100):.1f}%")
-    print(f"{'Neutral':<15} {neutral_count:<10} {(neutral_count/len(all_sentiments)*100):.1f}%")
-    print(f"{'Negative':<15} {negative_count:<10} {(negative_count/len(all_sentiments)*100):.1f}%")
-    
-    # Top mentioned subreddits
-    print(f"\n{'='*60}")
-    print("TOP SUBREDDITS BY MENTION COUNT")
-    print(f"{'='*60}\n")
-    
-    subreddit_counts: dict[str, int] = {}
-    for s in all_sentiments:
-        sub = s['subreddit']
-        subreddit_counts[sub] = subreddit_counts.get(sub, 0) + 1
-    
-    sorted_subreddits = sorted(subreddit_counts.items(), key=lambda x: x[1], reverse=True)
-    
-    print(f"{'Subreddit':<25} {'Mentions':<10}")
-    print(f"{'-'*35}")
-    for sub, count in sorted_subreddits[:5]:
-        print(f"r/{sub:<24} {count:<10}")
-    
-    # Show sample posts
-    print(f"\n{'='*60}")
-    print("SAMPLE POSTS (Top by Score)")
-    print(f"{'='*60}\n")
-    
-    # Sort by Reddit score and show top 3
-    top_posts = sorted(all_sentiments, key=lambda x: x['score'], reverse=True)[:3]
-    
+    lines += [
+        f"Overall Sentiment: {sentiment_label}\n",
+        
+        # Sentiment breakdown
+        f"{'Sentiment':<15} {'Count':<10} {'Percentage':<10}",
+        f"{'-'*35}",
+        f"{'Positive':<15} {positive_count:<10} {(positive_count/total_posts*100):.1f}%",
+        f"{'Neutral':<15} {neutral_count:<10} {(neutral_count/total_posts*100):.1f}%",
+        f"{'Negative':<15} {negative_count:<10} {(negative_count/total_posts*100):.1f}%",
+        
+        # Top mentioned subreddits
+        f"\n{'='*60}",
+        "TOP SUBREDDITS BY MENTION COUNT",
+        f"{'='*60}\n",
+        f"{'Subreddit':<25} {'Mentions':<10}",
+        f"{'-'*35}",
+    ]
+    lines += [f"r/{sub:<24} {count:<10}" for sub, count in subreddit_counts.most_common(5)]
+    
+    # Show sample posts (top 3 by Reddit score)
+    lines += [
+        f"\n{'='*60}",
+        "SAMPLE POSTS (Top by Score)",
+        f"{'='*60}\n",
+    ]
     for i, post in enumerate(top_posts, 1):
         sentiment_emoji = "📈" if post['sentiment'] > 0.05 else "📉" if post['sentiment'] < -0.05 else "➡️"
-        print(f"{i}. {sentiment_emoji} [{post['subreddit']}] Score: {post['sentiment']:.3f}")
-        print(f"   {post['title'][:100]}...")
-        print()
-    
-    print(f"{'='*60}\n")
+        lines += [
+            f"{i}. {sentiment_emoji} [{post['subreddit']}] Score: {post['sentiment']:.3f}",
+            f"   {post['title'][:100]}...",
+            "",
+        ]
+    
+    lines.append(f"{'='*60}\n")
+    print("\n".join(lines))
 
 
 def main():
     """Main entry point for the script."""
-    parser = argparse.ArgumentParser(
-        description='Analyze Reddit sentiment for a stock ticker'
-    )
-    parser.add_argument(
-        'ticker',
-        type=str,
-        help='Stock ticker symbol (e.g., AAPL, TSLA)'
-    )
-    
-    args = parser.parse_args()
+    # A single positional argument, so read sys.argv directly rather than
+    # paying argparse's import cost on every CLI start
+    usage = f"usage: {sys.argv[0]} TICKER\n\nAnalyze Reddit sentiment for a stock ticker (e.g., AAPL, TSLA)"
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print(usage)
+        sys.exit(0)
+    if len(sys.argv) != 2:
+        print(usage)
+        sys.exit(1)
+    ticker = sys.argv[1]
     
     # Check if setup is complete
     is_setup, message = check_setup()
@@ -193,7 +238,7 @@ def main():
         exit(1)
     
     try:
-        analyze_stock_sentiment(args.ticker)
+        analyze_stock_sentiment(ticker)
     except KeyboardInterrupt:
         print("\n\nAnalysis interrupted by user.")
     except Exception as e:
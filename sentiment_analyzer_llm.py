@@ -7,15 +7,21 @@ Usage:
     python sentiment_analyzer_llm.py NVDA --subreddits 1,3,5
 """
 import argparse
+import heapq
 import os
+import re
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from config import STOCK_SUBREDDITS
-from database import init_database, save_sentiment
-from reddit_client_llm import get_ticker_sentiment_llm
-from llm_extractor import get_available_models
-from llm_manager import MultiModelManager
+from config import OPENROUTER_API_KEY, STOCK_SUBREDDITS
 from setup_checker import check_setup, prompt_openrouter_setup
+# The Reddit/LLM/VADER modules are imported where they're used, so
+# --help, --list-subreddits and --list-models start without loading them
+
+
+# One selection part: a subreddit number or an inclusive "start-end" range
+_SELECTION_PART_RE = re.compile(r'(\d+)(?:-(\d+))?')
 
 
 def parse_subreddit_selection(selection_str: str, subreddit_list: list) -> list:
@@ -36,46 +42,36 @@ def parse_subreddit_selection(selection_str: str, subreddit_list: list) -> list:
         List of selected subreddits
     """
     selected = []
-    parts = selection_str.split(',')
     
-    for part in parts:
+    for part in selection_str.split(','):
         part = part.strip()
-        if '-' in part:
-            # Range (e.g., "1-5")
-            try:
-                start, end = part.split('-')
-                start_idx = int(start) - 1  # Convert to 0-based
-                end_idx = int(end)  # End is inclusive, so we use it directly
-                
-                if start_idx < 0 or end_idx > len(subreddit_list):
-                    print(f"⚠️  Warning: Range {part} out of bounds (1-{len(subreddit_list)})")
-                    continue
-                
-                selected.extend(subreddit_list[start_idx:end_idx])
-            except (ValueError, IndexError):
-                print(f"⚠️  Warning: Invalid range '{part}'")
+        match = _SELECTION_PART_RE.fullmatch(part)
+        if match is None:
+            kind = 'range' if '-' in part else 'selection'
+            print(f"⚠️  Warning: Invalid {kind} '{part}'")
+            continue
+        
+        start, end = match.groups()
+        if end is not None:
+            # Range (e.g., "1-5"); end is inclusive, so it is the slice stop as-is
+            start_idx = int(start) - 1  # Convert to 0-based
+            end_idx = int(end)
+            
+            if start_idx < 0 or end_idx > len(subreddit_list):
+                print(f"⚠️  Warning: Range {part} out of bounds (1-{len(subreddit_list)})")
                 continue
+            
+            selected.extend(subreddit_list[start_idx:end_idx])
         else:
             # Single number (e.g., "3")
-            try:
-                idx = int(part) - 1  # Convert to 0-based
-                if 0 <= idx < len(subreddit_list):
-                    selected.append(subreddit_list[idx])
-                else:
-                    print(f"⚠️  Warning: Subreddit #{part} out of bounds (1-{len(subreddit_list)})")
-            except ValueError:
-                print(f"⚠️  Warning: Invalid selection '{part}'")
-                continue
+            idx = int(start) - 1  # Convert to 0-based
+            if 0 <= idx < len(subreddit_list):
+                selected.append(subreddit_list[idx])
+            else:
+                print(f"⚠️  Warning: Subreddit #{part} out of bounds (1-{len(subreddit_list)})")
     
     # Remove duplicates while preserving order
-    seen = set()
-    unique_selected = []
-    for sub in selected:
-        if sub not in seen:
-            seen.add(sub)
-            unique_selected.append(sub)
-    
-    return unique_selected
+    return list(dict.fromkeys(selected))
 
 
 def show_subreddit_list():
@@ -93,24 +89,35 @@ def show_subreddit_list():
     print()
 
 
-def analyze_sentiment_with_context(text: str, llm_context: str, analyzer: SentimentIntensityAnalyzer) -> dict:
+@lru_cache(maxsize=16384)
+def _polarity_scores(text: str) -> dict:
+    """
+    VADER scores for text, cached by the exact string.
+    
+    Crossposts, reposted titles and templated LLM contexts repeat verbatim,
+    so each distinct string is scored once. Callers must not mutate the result.
+    """
+    from sentiment_analyzer import get_analyzer
+    return get_analyzer().polarity_scores(text)
+
+
+def analyze_sentiment_with_context(text: str, llm_context: str) -> dict:
     """
     Analyze sentiment considering LLM-extracted context.
     
     Args:
         text: Original text
         llm_context: LLM's interpretation of the discussion
-        analyzer: VADER sentiment analyzer
         
     Returns:
         Dictionary with sentiment scores and context
     """
     # Get VADER sentiment
-    vader_scores = analyzer.polarity_scores(text)
+    vader_scores = _polarity_scores(text)
     
     # Use LLM context for better understanding
     if llm_context:
-        context_scores = analyzer.polarity_scores(llm_context)
+        context_scores = _polarity_scores(llm_context)
         # Weighted average: 60% original, 40% LLM context
         compound = (vader_scores['compound'] * 0.6) + (context_scores['compound'] * 0.4)
     else:
@@ -126,33 +133,37 @@ def analyze_sentiment_with_context(text: str, llm_context: str, analyzer: Sentim
 def process_subreddit_sentiment_llm(
     subreddit_name: str,
     ticker: str,
-    analyzer: SentimentIntensityAnalyzer,
     model_manager
 ) -> list:
     """Process sentiment for a ticker in a subreddit using LLM."""
+    from database import save_sentiment_many
+    from reddit_client_llm import get_ticker_sentiment_llm
+    
     print(f"Analyzing r/{subreddit_name} with LLM...")
     
     posts = get_ticker_sentiment_llm(subreddit_name, ticker, model_manager=model_manager)
     sentiments = []
+    rows = []  # Database rows, built in the same pass
     
     for post in posts:
         sentiment_data = analyze_sentiment_with_context(
             post['text'],
-            post.get('llm_context', ''),
-            analyzer
+            post.get('llm_context', '')
         )
+        compound = sentiment_data['compound']
         
         sentiments.append({
             'subreddit': subreddit_name,
             'post_id': post['id'],
-            'sentiment': sentiment_data['compound'],
+            'sentiment': compound,
             'title': post['title'],
             'score': post['score'],
             'llm_context': sentiment_data['llm_context']
         })
-        
-        # Save to database
-        save_sentiment(ticker, subreddit_name, post['id'], sentiment_data['compound'])
+        rows.append((ticker, subreddit_name, post['id'], compound))
+    
+    # Save to database in one transaction
+    save_sentiment_many(rows)
     
     print(f"✓ r/{subreddit_name}: Analyzed {len(sentiments)} posts with context")
     
@@ -166,10 +177,13 @@ def analyze_stock_sentiment_llm(
     subreddit_selection: str = None
 ):
     """Analyze sentiment with LLM-enhanced context."""
+    from database import init_database
+    from llm_manager import get_model_manager
+    
     ticker = ticker.upper()
     
     if model_manager is None:
-        model_manager = MultiModelManager()
+        model_manager = get_model_manager()
     
     # Determine which subreddits to analyze
     if test_mode:
@@ -195,58 +209,65 @@ def analyze_stock_sentiment_llm(
     
     # Initialize
     init_database()
-    analyzer = SentimentIntensityAnalyzer()
     
-    # Process subreddits in parallel
+    # Process subreddits in parallel, one thread each: the work is almost all
+    # waiting on Reddit (through one shared PRAW client and rate limiter), and
+    # each subreddit's scores are folded into running totals as it finishes
     all_sentiments = []
+    total_sentiment = 0.0
+    positive_count = negative_count = 0
+    subreddit_counts: Counter = Counter()
     
-    with ThreadPoolExecutor(max_workers=2) as executor:
+    with ThreadPoolExecutor(max_workers=len(subreddits)) as executor:
         future_to_subreddit = {
-            executor.submit(process_subreddit_sentiment_llm, sub, ticker, analyzer, model_manager): sub
+            executor.submit(process_subreddit_sentiment_llm, sub, ticker, model_manager): sub
             for sub in subreddits
         }
         
         for future in as_completed(future_to_subreddit):
+            subreddit = future_to_subreddit[future]
             try:
                 sentiments = future.result()
-                all_sentiments.extend(sentiments)
             except Exception as e:
-                subreddit = future_to_subreddit[future]
                 print(f"✗ Error processing r/{subreddit}: {e}")
+                continue
+            
+            for post in sentiments:
+                score = post['sentiment']
+                total_sentiment += score
+                if score > 0.05:
+                    positive_count += 1
+                elif score < -0.05:
+                    negative_count += 1
+            if sentiments:
+                subreddit_counts[subreddit] += len(sentiments)
+            all_sentiments.extend(sentiments)
     
     # Calculate statistics
     if not all_sentiments:
         print(f"\n⚠ No recent mentions found for ${ticker}\n")
         return
     
-    sentiment_scores = [s['sentiment'] for s in all_sentiments]
-    avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
+    avg_sentiment = total_sentiment / len(all_sentiments)
+    neutral_count = len(all_sentiments) - positive_count - negative_count
     
-    positive_count = sum(1 for s in sentiment_scores if s > 0.05)
-    negative_count = sum(1 for s in sentiment_scores if s < -0.05)
-    neutral_count = len(sentiment_scores) - positive_count - negative_count
+    # Top 5 by Reddit score, shared by the Convex summary and the report
+    top_posts = heapq.nlargest(5, all_sentiments, key=itemgetter('score'))
     
     # Save to Convex (if configured)
     try:
-        import os
-        from collections import Counter
         if os.getenv('CONVEX_URL'):
-            from convex_client import StockConvexClient
+            from convex_client import get_convex_client
             
-            client = StockConvexClient()
+            client = get_convex_client()
             
             # Build subreddit mentions
-            subreddit_counter = Counter()
-            for s in all_sentiments:
-                subreddit_counter[s['subreddit']] += 1
-            
             subreddit_mentions = [
                 {"subreddit": sub, "count": count}
-                for sub, count in subreddit_counter.items()
+                for sub, count in subreddit_counts.items()
             ]
             
             # Compile AI context from top posts
-            top_posts = sorted(all_sentiments, key=lambda x: x['score'], reverse=True)[:5]
             ai_context_parts = []
             for post in top_posts:
                 if post.get('llm_context'):
@@ -289,12 +310,15 @@ def analyze_stock_sentiment_llm(
         if 'CONVEX_URL not found' not in str(e):
             print(f"⚠ Convex save skipped: {e}")
     
-    print(f"\n{'='*60}")
-    print(f"SENTIMENT ANALYSIS RESULTS - ${ticker}")
-    print(f"{'='*60}\n")
-    
-    print(f"Total Posts Analyzed: {len(all_sentiments)}")
-    print(f"\nOverall Sentiment Score: {avg_sentiment:.3f}")
+    # Display results, written out in one go
+    total_posts = len(all_sentiments)
+    lines = [
+        f"\n{'='*60}",
+        f"SENTIMENT ANALYSIS RESULTS - ${ticker}",
+        f"{'='*60}\n",
+        f"Total Posts Analyzed: {total_posts}",
+        f"\nOverall Sentiment Score: {avg_sentiment:.3f}",
+    ]
     
     if avg_sentiment >= 0.05:
         sentiment_label = "POSITIVE 📈"
@@ -303,31 +327,34 @@ def analyze_stock_sentiment_llm(
     else:
         sentiment_label = "NEUTRAL ➡️"
     
-    print(f"Overall Sentiment: {sentiment_label}\n")
-    
-    # Sentiment breakdown
-    print(f"{'Sentiment':<15} {'Count':<10} {'Percentage':<10}")
-    print(f"{'-'*35}")
-    print(f"{'Positive':<15} {positive_count:<10} {(positive_count/len(all_sentiments)*100):.1f}%")
-    print(f"{'Neutral':<15} {neutral_count:<10} {(neutral_count/len(all_sentiments)*100):.1f}%")
-    print(f"{'Negative':<15} {negative_count:<10} {(negative_count/len(all_sentiments)*100):.1f}%")
-    
-    # Show LLM context insights
-    print(f"\n{'='*60}")
-    print("LLM CONTEXT INSIGHTS (Top Posts)")
-    print(f"{'='*60}\n")
-    
-    top_posts = sorted(all_sentiments, key=lambda x: x['score'], reverse=True)[:5]
+    lines += [
+        f"Overall Sentiment: {sentiment_label}\n",
+        
+        # Sentiment breakdown
+        f"{'Sentiment':<15} {'Count':<10} {'Percentage':<10}",
+        f"{'-'*35}",
+        f"{'Positive':<15} {positive_count:<10} {(positive_count/total_posts*100):.1f}%",
+        f"{'Neutral':<15} {neutral_count:<10} {(neutral_count/total_posts*100):.1f}%",
+        f"{'Negative':<15} {negative_count:<10} {(negative_count/total_posts*100):.1f}%",
+        
+        # Show LLM context insights
+        f"\n{'='*60}",
+        "LLM CONTEXT INSIGHTS (Top Posts)",
+        f"{'='*60}\n",
+    ]
     
     for i, post in enumerate(top_posts, 1):
         sentiment_emoji = "📈" if post['sentiment'] > 0.05 else "📉" if post['sentiment'] < -0.05 else "➡️"
-        print(f"{i}. {sentiment_emoji} [{post['subreddit']}] Sentiment: {post['sentiment']:.3f}")
-        print(f"   Title: {post['title'][:80]}...")
+        lines += [
+            f"{i}. {sentiment_emoji} [{post['subreddit']}] Sentiment: {post['sentiment']:.3f}",
+            f"   Title: {post['title'][:80]}...",
+        ]
         if post.get('llm_context'):
-            print(f"   Context: {post['llm_context'][:100]}...")
-        print()
+            lines.append(f"   Context: {post['llm_context'][:100]}...")
+        lines.append("")
     
-    print(f"{'='*60}\n")
+    lines.append(f"{'='*60}\n")
+    print("\n".join(lines))
 
 
 def main():
@@ -374,6 +401,7 @@ def main():
         return
     
     if args.list_models:
+        from llm_extractor import get_available_models
         print("\n🤖 Available Models:\n")
         for model in get_available_models():
             print(f"  • {model}")
@@ -387,7 +415,7 @@ def main():
         exit(1)
     
     # Check for OpenRouter API key for LLM features
-    if not os.getenv('OPENROUTER_API_KEY'):
+    if not OPENROUTER_API_KEY:
         print(prompt_openrouter_setup())
         exit(1)
     
@@ -396,7 +424,8 @@ def main():
         print("⚠️  Warning: --test-mode overrides --subreddits selection")
     
     try:
-        model_manager = MultiModelManager(max_requests_per_day=args.max_requests)
+        from llm_manager import get_model_manager
+        model_manager = get_model_manager(args.max_requests)
         analyze_stock_sentiment_llm(
             args.ticker,
             model_manager=model_manager,
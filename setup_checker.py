@@ -1,6 +1,7 @@
 """Setup checker to guide users through configuration."""
 import os
 from pathlib import Path
+from config import REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET
 
 
 def check_setup() -> tuple[bool, str]:
@@ -16,19 +17,12 @@ def check_setup() -> tuple[bool, str]:
     if not env_file.exists():
         return False, create_setup_guide("missing_env")
     
-    # Load environment variables
-    from dotenv import load_dotenv
-    load_dotenv()
-    
-    # Check Reddit credentials
-    reddit_id = os.getenv('REDDIT_CLIENT_ID')
-    reddit_secret = os.getenv('REDDIT_CLIENT_SECRET')
-    reddit_agent = os.getenv('REDDIT_USER_AGENT')
-    
-    if not reddit_id or not reddit_secret:
+    # Check Reddit credentials (config has already loaded .env into the environment)
+    if not REDDIT_CLIENT_ID or not REDDIT_CLIENT_SECRET:
         return False, create_setup_guide("missing_reddit")
     
-    if not reddit_agent:
+    # config falls back to a default user agent, so check the variable itself
+    if not os.getenv('REDDIT_USER_AGENT'):
         return False, create_setup_guide("missing_user_agent")
     
     return True, "✅ Configuration complete!"
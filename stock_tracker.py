@@ -66,8 +66,10 @@ def track_hot_stocks(timeframe: str = 'day'):
                 all_tickers.update(ticker_counter)
                 
                 # Prepare data for database storage
-                for ticker, count in ticker_counter.items():
-                    subreddit_data.append((ticker, subreddit_name, count, timeframe))
+                subreddit_data.extend(
+                    (ticker, subreddit_name, count, timeframe)
+                    for ticker, count in ticker_counter.items()
+                )
                     
             except Exception as e:
                 subreddit = future_to_subreddit[future]
@@ -8,16 +8,21 @@ Usage:
 """
 import argparse
 import os
+import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import Counter
-from config import STOCK_SUBREDDITS
+from config import OPENROUTER_API_KEY, STOCK_SUBREDDITS
 from database import init_database, save_stock_mentions
 from reddit_client_llm import get_subreddit_tickers_llm
 from llm_extractor import get_available_models
-from llm_manager import MultiModelManager
+from llm_manager import get_model_manager
 from setup_checker import check_setup, prompt_openrouter_setup
 
 
+# One selection part: a subreddit number or an inclusive "start-end" range
+_SELECTION_PART_RE = re.compile(r'(\d+)(?:-(\d+))?')
+
+
 def parse_subreddit_selection(selection_str: str, subreddit_list: list) -> list:
     """
     Parse subreddit selection string.
@@ -36,46 +41,36 @@ def parse_subreddit_selection(selection_str: str, subreddit_list: list) -> list:
         List of selected subreddits
     """
     selected = []
-    parts = selection_str.split(',')
     
-    for part in parts:
+    for part in selection_str.split(','):
         part = part.strip()
-        if '-' in part:
-            # Range (e.g., "1-5")
-            try:
-                start, end = part.split('-')
-                start_idx = int(start) - 1  # Convert to 0-based
-                end_idx = int(end)  # End is inclusive, so we use it directly
-                
-                if start_idx < 0 or end_idx > len(subreddit_list):
-                    print(f"⚠️  Warning: Range {part} out of bounds (1-{len(subreddit_list)})")
-                    continue
-                
-                selected.extend(subreddit_list[start_idx:end_idx])
-            except (ValueError, IndexError):
-                print(f"⚠️  Warning: Invalid range '{part}'")
+        match = _SELECTION_PART_RE.fullmatch(part)
+        if match is None:
+            kind = 'range' if '-' in part else 'selection'
+            print(f"⚠️  Warning: Invalid {kind} '{part}'")
+            continue
+        
+        start, end = match.groups()
+        if end is not None:
+            # Range (e.g., "1-5"); end is inclusive, so it is the slice stop as-is
+            start_idx = int(start) - 1  # Convert to 0-based
+            end_idx = int(end)
+            
+            if start_idx < 0 or end_idx > len(subreddit_list):
+                print(f"⚠️  Warning: Range {part} out of bounds (1-{len(subreddit_list)})")
                 continue
+            
+            selected.extend(subreddit_list[start_idx:end_idx])
         else:
             # Single number (e.g., "3")
-            try:
-                idx = int(part) - 1  # Convert to 0-based
-                if 0 <= idx < len(subreddit_list):
-                    selected.append(subreddit_list[idx])
-                else:
-                    print(f"⚠️  Warning: Subreddit #{part} out of bounds (1-{len(subreddit_list)})")
-            except ValueError:
-                print(f"⚠️  Warning: Invalid selection '{part}'")
-                continue
+            idx = int(start) - 1  # Convert to 0-based
+            if 0 <= idx < len(subreddit_list):
+                selected.append(subreddit_list[idx])
+            else:
+                print(f"⚠️  Warning: Subreddit #{part} out of bounds (1-{len(subreddit_list)})")
     
     # Remove duplicates while preserving order
-    seen = set()
-    unique_selected = []
-    for sub in selected:
-        if sub not in seen:
-            seen.add(sub)
-            unique_selected.append(sub)
-    
-    return unique_selected
+    return list(dict.fromkeys(selected))
 
 
 def show_subreddit_list():
@@ -131,7 +126,7 @@ def track_hot_stocks_llm(
 ):
     """Track hot stocks using LLM-based extraction."""
     if model_manager is None:
-        model_manager = MultiModelManager()
+        model_manager = get_model_manager()
     
     # Determine which subreddits to analyze
     if test_mode:
@@ -163,9 +158,13 @@ def track_hot_stocks_llm(
     # Process subreddits in parallel
     all_tickers: Counter = Counter()
     subreddit_data = []
+    # Each subreddit's own counts, for per-ticker lookups when saving to Convex
+    subreddit_counters = {}
     
-    # Use fewer workers for LLM to avoid rate limits
-    with ThreadPoolExecutor(max_workers=2) as executor:
+    # One thread per subreddit, so one scan's Reddit fetches overlap another's
+    # LLM requests; the LLM requests themselves share a process-wide cap
+    # (reddit_client_llm.LLM_CONCURRENCY) and Reddit calls one rate limiter
+    with ThreadPoolExecutor(max_workers=len(subreddits)) as executor:
         future_to_subreddit = {
             executor.submit(
                 process_subreddit_llm,
@@ -184,9 +183,12 @@ def track_hot_stocks_llm(
             try:
                 subreddit_name, ticker_counter = future.result()
                 all_tickers.update(ticker_counter)
+                subreddit_counters[subreddit_name] = ticker_counter
                 
-                for ticker, count in ticker_counter.items():
-                    subreddit_data.append((ticker, subreddit_name, count, timeframe))
+                subreddit_data.extend(
+                    (ticker, subreddit_name, count, timeframe)
+                    for ticker, count in ticker_counter.items()
+                )
                     
             except Exception as e:
                 subreddit = future_to_subreddit[future]
@@ -202,19 +204,17 @@ def track_hot_stocks_llm(
     try:
         import os
         if os.getenv('CONVEX_URL'):
-            from convex_client import StockConvexClient
+            from convex_client import get_convex_client
             print("\nSaving to Convex...")
             
-            client = StockConvexClient()
+            client = get_convex_client()
             for ticker, count in all_tickers.most_common(10):
                 # Build subreddit mentions
-                subreddit_mentions = []
-                for subreddit in subreddits:
-                    # Find count in subreddit_data
-                    for t, sub, c, tf in subreddit_data:
-                        if t == ticker and sub == subreddit:
-                            subreddit_mentions.append({"subreddit": sub, "count": c})
-                            break
+                subreddit_mentions = [
+                    {"subreddit": sub, "count": subreddit_counters[sub][ticker]}
+                    for sub in subreddits
+                    if ticker in subreddit_counters.get(sub, ())
+                ]
                 
                 # Save to Convex
                 client.save_analysis(
@@ -365,7 +365,7 @@ def main():
         exit(1)
     
     # Check for OpenRouter API key for LLM features
-    if not os.getenv('OPENROUTER_API_KEY'):
+    if not OPENROUTER_API_KEY:
         print(prompt_openrouter_setup())
         exit(1)
     
@@ -374,7 +374,7 @@ def main():
         print("⚠️  Warning: --test-mode overrides --subreddits selection")
     
     try:
-        model_manager = MultiModelManager(max_requests_per_day=args.max_requests)
+        model_manager = get_model_manager(args.max_requests)
         track_hot_stocks_llm(
             timeframe=args.timeframe,
             model_manager=model_manager,
@@ -2,9 +2,10 @@
 Quick test to demonstrate LLM extraction vs regex.
 Run this to see the difference in accuracy.
 """
-from llm_extractor import extract_tickers_with_llm
+from llm_extractor import extract_tickers_batch
+from llm_manager import get_model_manager
 from reddit_client import extract_tickers
-from ticker_validator import fetch_valid_tickers
+from ticker_validator import get_valid_tickers
 
 # Test posts with tricky cases
 test_posts = [
@@ -29,9 +30,17 @@ print("="*70)
 print("TESTING: Regex vs LLM Stock Extraction")
 print("="*70)
 
-valid_tickers = fetch_valid_tickers()
+valid_tickers = get_valid_tickers()
 
-for i, post in enumerate(test_posts, 1):
+# LLM extraction (requires API key): all posts in one batched request
+try:
+    llm_results = extract_tickers_batch(test_posts, get_model_manager(), valid_tickers=valid_tickers)
+    llm_error = None
+except Exception as e:
+    llm_results = [None] * len(test_posts)
+    llm_error = e
+
+for i, (post, llm_result) in enumerate(zip(test_posts, llm_results), 1):
     print(f"\n📝 TEST POST #{i}:")
     print("-" * 70)
     print(post.strip())
@@ -42,18 +51,13 @@ for i, post in enumerate(test_posts, 1):
     print(f"\n🔤 REGEX METHOD:")
     print(f"   Found: {sorted(regex_tickers)}")
     
-    # LLM extraction (requires API key)
-    try:
-        llm_result = extract_tickers_with_llm(post, valid_tickers=valid_tickers)
-        print(f"\n🤖 LLM METHOD:")
-        print(f"   Found: {sorted(llm_result['tickers'])}")
-        if llm_result['context']:
-            print(f"   Context:")
-            for ticker, context in llm_result['context'].items():
-                print(f"      • {ticker}: {context[:80]}...")
-    except Exception as e:
-        print(f"\n🤖 LLM METHOD:")
-        print(f"   ⚠️  Skipped (API key needed): {str(e)[:50]}")
+    print(f"\n🤖 LLM METHOD:")
+    if llm_error is not None:
+        print(f"   ⚠️  Skipped (API key needed): {str(llm_error)[:50]}")
+    else:
+        print(f"   Found: {sorted(llm_result.get('tickers', []))}")
+        if llm_result.get('context'):
+            print(f"   Context: {llm_result['context'][:80]}...")
     
     print()
 
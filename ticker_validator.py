@@ -5,8 +5,12 @@ Updated nightly by GitHub Actions with real NASDAQ, NYSE, and AMEX symbols.
 import requests
 import json
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Set
+from typing import FrozenSet, Optional, Set, Tuple
 
 # GitHub raw URLs for ticker lists
 TICKER_SOURCES = {
@@ -18,15 +22,52 @@ TICKER_SOURCES = {
 CACHE_FILE = 'valid_tickers_cache.json'
 CACHE_DURATION_HOURS = 24  # Refresh once per day
 
+# Valid tickers shared by every caller in this process; fetch_valid_tickers
+# re-reads its JSON cache file each time, so it's only called on refresh
+_VALID_TICKERS: Optional[FrozenSet[str]] = None
+_VALID_TICKERS_TS = 0.0
+# Subreddit worker threads all ask at once; only one of them fetches
+_valid_tickers_lock = threading.Lock()
+
+
+def _fetch_exchange_tickers(url: str, etag: Optional[str] = None) -> Tuple[Optional[list], Optional[str]]:
+    """
+    Download one exchange's newline-separated ticker list (runs in a worker thread).
+    
+    Args:
+        url: Raw ticker list URL
+        etag: ETag of the cached copy, sent as If-None-Match
+    
+    Returns:
+        (tickers, etag) - tickers is None if the list is unchanged since etag
+    """
+    headers = {'If-None-Match': etag} if etag else None
+    response = requests.get(url, headers=headers, timeout=10)
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    tickers = [line.strip() for line in response.text.strip().split('\n') if line.strip()]
+    return tickers, response.headers.get('ETag')
+
+
+def _cached_tickers(cache_data: dict) -> Set[str]:
+    """Union of a cache file's ticker lists (older files hold one flat list)."""
+    if 'exchanges' in cache_data:
+        return set().union(*cache_data['exchanges'].values())
+    return set(cache_data['tickers'])
+
 
 def fetch_valid_tickers() -> Set[str]:
     """
     Fetch valid US stock tickers from GitHub repository.
-    Uses local cache if available and less than 24 hours old.
+    Uses local cache if available and less than 24 hours old; once it's
+    stale, lists that haven't changed (same ETag) are reused, not downloaded.
     
     Returns:
         Set of valid ticker symbols
     """
+    cache_data = {}
+    
     # Check cache first
     if os.path.exists(CACHE_FILE):
         try:
@@ -36,37 +77,69 @@ def fetch_valid_tickers() -> Set[str]:
                 
                 # Use cache if less than 24 hours old
                 if datetime.now() - cache_time < timedelta(hours=CACHE_DURATION_HOURS):
-                    print(f"✓ Using cached ticker list ({len(cache_data['tickers'])} tickers)")
-                    return set(cache_data['tickers'])
+                    cached_tickers = _cached_tickers(cache_data)
+                    print(f"✓ Using cached ticker list ({len(cached_tickers)} tickers)")
+                    return cached_tickers
         except Exception as e:
             print(f"Warning: Cache read failed: {e}")
+            cache_data = {}
+    
+    # Revalidate against the cached copy of each exchange's list
+    cached_exchanges = cache_data.get('exchanges', {})
+    cached_etags = cache_data.get('etags', {})
     
     # Fetch fresh data
     print("Fetching latest ticker list from GitHub...")
     valid_tickers = set()
+    exchanges = {}
+    etags = {}
     
-    for exchange, url in TICKER_SOURCES.items():
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # Parse newline-separated tickers
-            tickers = [line.strip() for line in response.text.strip().split('\n') if line.strip()]
-            valid_tickers.update(tickers)
-            print(f"✓ Fetched {len(tickers)} tickers from {exchange.upper()}")
-            
-        except Exception as e:
-            print(f"⚠ Warning: Failed to fetch {exchange.upper()} tickers: {e}")
+    # The downloads are independent round trips, so run them concurrently;
+    # results are still reported in TICKER_SOURCES order
+    with ThreadPoolExecutor(max_workers=len(TICKER_SOURCES)) as executor:
+        futures = {
+            exchange: executor.submit(
+                _fetch_exchange_tickers, url,
+                cached_etags.get(exchange) if exchange in cached_exchanges else None
+            )
+            for exchange, url in TICKER_SOURCES.items()
+        }
+        for exchange, future in futures.items():
+            try:
+                tickers, etag = future.result()
+                if tickers is None:
+                    tickers = cached_exchanges[exchange]
+                    print(f"✓ {exchange.upper()} list unchanged ({len(tickers)} tickers)")
+                else:
+                    print(f"✓ Fetched {len(tickers)} tickers from {exchange.upper()}")
+                valid_tickers.update(tickers)
+                exchanges[exchange] = tickers
+                if etag:
+                    etags[exchange] = etag
+                
+            except Exception as e:
+                print(f"⚠ Warning: Failed to fetch {exchange.upper()} tickers: {e}")
     
     if valid_tickers:
         # Save to cache
         try:
             cache_data = {
                 'timestamp': datetime.now().isoformat(),
-                'tickers': list(valid_tickers)
+                'exchanges': exchanges,
+                'etags': etags
             }
-            with open(CACHE_FILE, 'w') as f:
-                json.dump(cache_data, f)
+            # Write a temp file and rename it over the cache, so a reader
+            # never sees a half-written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(CACHE_FILE)), prefix='valid_tickers_cache.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(cache_data, f)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, CACHE_FILE)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
             print(f"✓ Cached {len(valid_tickers)} valid tickers")
         except Exception as e:
             print(f"Warning: Cache write failed: {e}")
@@ -90,9 +163,29 @@ def is_valid_ticker(ticker: str, valid_tickers: Set[str]) -> bool:
     return ticker in valid_tickers
 
 
+def get_valid_tickers() -> FrozenSet[str]:
+    """Return the process-wide valid ticker set, refreshing it once it's a day old."""
+    global _VALID_TICKERS, _VALID_TICKERS_TS
+    valid_tickers = _VALID_TICKERS
+    if valid_tickers is not None and time.monotonic() - _VALID_TICKERS_TS <= CACHE_DURATION_HOURS * 3600:
+        return valid_tickers
+    
+    with _valid_tickers_lock:
+        # Another thread may have refreshed it while this one waited
+        now = time.monotonic()
+        if _VALID_TICKERS is None or now - _VALID_TICKERS_TS > CACHE_DURATION_HOURS * 3600:
+            _VALID_TICKERS = frozenset(fetch_valid_tickers())
+            _VALID_TICKERS_TS = now
+        return _VALID_TICKERS
+
+
 def force_refresh_tickers():
-    """Force refresh the ticker cache."""
-    if os.path.exists(CACHE_FILE):
-        os.remove(CACHE_FILE)
-    return fetch_valid_tickers()
+    """Force refresh the ticker cache, installing the fresh set for get_valid_tickers."""
+    global _VALID_TICKERS, _VALID_TICKERS_TS
+    with _valid_tickers_lock:
+        if os.path.exists(CACHE_FILE):
+            os.remove(CACHE_FILE)
+        _VALID_TICKERS = frozenset(fetch_valid_tickers())
+        _VALID_TICKERS_TS = time.monotonic()
+        return _VALID_TICKERS
 